@@ -0,0 +1,34 @@
+"""Benchmarks of the overhead added by the logger_wraps decorator"""
+
+from logger.logger import logger_wraps
+
+
+def plain_function(message, value: int) -> int:
+    """The function without the decorator"""
+
+    return value + 1
+
+
+@logger_wraps()
+def wrapped_function(message, value: int) -> int:
+    """The same function with the decorator"""
+
+    return value + 1
+
+
+def test_plain_call(benchmark, user, message) -> None:
+    """Call of the function without the decorator (reference value)"""
+
+    assert benchmark(plain_function, message, 1) == 2
+
+
+def test_logger_wraps_call(benchmark, user, message) -> None:
+    """Call of the function with the decorator (positional message argument)"""
+
+    assert benchmark(wrapped_function, message, 1) == 2
+
+
+def test_logger_wraps_call_with_kwargs(benchmark, user, message) -> None:
+    """Call of the function with the decorator (keyword message argument)"""
+
+    assert benchmark(wrapped_function, message=message, value=1) == 2
@@ -0,0 +1,28 @@
+"""Benchmarks of the RapidAPI payloads parsing"""
+
+from conftest import load_fixture, make_response
+from handlers.handlers_for_request_and_after.rapidapi import gets_main_hotels_data
+from models.hotel import Hotel
+from utils.parsing import parse_summary
+
+
+def test_gets_main_hotels_data(benchmark, user, message) -> None:
+    """Parsing of the 200 properties payload of the /properties/v2/list endpoint"""
+
+    response = make_response('properties.json')
+
+    def parse() -> None:
+        user.third_condition = True
+        gets_main_hotels_data(response=response, user=user, message=message)
+
+    benchmark(parse)
+    assert len(user.current_buffer) == 200
+
+
+def test_parse_summary(benchmark) -> None:
+    """Parsing of the payload of the /properties/v2/get-summary endpoint"""
+
+    content = load_fixture('summary.json')
+
+    hotel = benchmark(lambda: parse_summary(content, Hotel('1000000')))
+    assert hotel.address and len(hotel.images) == 40
@@ -0,0 +1,25 @@
+"""Benchmarks of the hotels ranking for the /highprice and /bestdeal commands"""
+
+from handlers.handlers_for_request_and_after.rapidapi import high_price, best_deal
+
+
+def test_high_price(benchmark, user, message, hotels_buffer) -> None:
+    """Sorting of 200 hotels by descending prices"""
+
+    def rank() -> None:
+        user.current_buffer = hotels_buffer()
+        high_price(message)
+
+    benchmark(rank)
+    assert len(user.current_buffer) == 200
+
+
+def test_best_deal(benchmark, user, message, hotels_buffer) -> None:
+    """Sorting of 200 hotels in the given ranges of prices and distances"""
+
+    def rank() -> None:
+        user.current_buffer = hotels_buffer()
+        best_deal(message)
+
+    benchmark(rank)
+    assert len(user.current_buffer) == 200
@@ -0,0 +1,96 @@
+"""Benchmarks of the messages rendering and the keyboards building"""
+
+import json
+from datetime import datetime
+
+from conftest import load_fixture
+from database import destinations
+from handlers.handlers_for_request_and_after.rapidapi import create_text_message, processing_cities
+from keyboards.inline.inline_keyboards import cities_keyboard, show_more_hotels_if_there_are_available_variants
+from models.database import Search, SearchResult
+from utils.templates import render_search
+
+
+def test_create_text_message(benchmark, user, message, hotels_buffer, summary) -> None:
+    """Rendering of the message with the description of the hotel"""
+
+    user.current_buffer = hotels_buffer()
+    hotel = next(iter(user.current_buffer.values()))
+    hotel.address = summary["data"]["propertyInfo"]["summary"]["location"]["address"]["addressLine"]
+    hotel.rating = summary["data"]["propertyInfo"]["summary"]["overview"]["propertyRating"]["rating"]
+    user.current_hotel_index = 0
+
+    def forget_rendered() -> None:
+        user.rendered_hotels = None
+
+    result = benchmark.pedantic(create_text_message, args=(message,), setup=forget_rendered,
+                                rounds=200, warmup_rounds=5)
+    assert result
+
+
+def test_create_text_message_again(benchmark, user, message, hotels_buffer) -> None:
+    """Repeated rendering of the same hotel during the search (e.g. the caption of the album
+    sent again), which returns the remembered description"""
+
+    user.current_buffer = hotels_buffer()
+    user.current_hotel_index = 0
+    first = create_text_message(message)
+
+    result = benchmark(create_text_message, message)
+    assert result == first
+
+
+def test_processing_cities(benchmark, user, message) -> None:
+    """Extraction of the found locations and displaying them in the keyboard"""
+
+    suggestions = json.loads(load_fixture('locations.json'))["sr"]
+
+    def process() -> None:
+        user.current_buffer = list(suggestions)
+        processing_cities(message)
+
+    benchmark(process)
+    assert len(user.current_buffer) == len(suggestions)
+
+
+def test_destination_lookup(benchmark) -> None:
+    """Looking up the entered city in the destination index (instead of the locations request)"""
+
+    destinations.save_destinations(json.loads(load_fixture('locations.json'))["sr"])
+
+    result = benchmark(destinations.lookup, 'Москва')
+    assert result[0] == ('Москва, Россия', '2734')
+
+
+def test_cities_keyboard(benchmark, user, message) -> None:
+    """Building of the keyboard with the found locations"""
+
+    suggestions = json.loads(load_fixture('locations.json'))["sr"]
+    user.current_buffer = tuple((item["regionNames"]["fullName"], item["essId"]["sourceId"])
+                                for item in suggestions)
+
+    benchmark(cities_keyboard, message)
+
+
+def test_show_more_keyboard(benchmark, user, message, hotels_buffer) -> None:
+    """Building of the closing keyboard with the websites of the displayed page"""
+
+    user.current_buffer = hotels_buffer()
+    page = list(user.current_buffer.values())[:user.hotels_count]
+
+    benchmark(show_more_hotels_if_there_are_available_variants, message, hotels=page)
+    assert user.kept_keyboard
+
+
+def test_render_search(benchmark, user, message, hotels_buffer) -> None:
+    """Rendering of the search from the history with the page of its hotels"""
+
+    user.current_buffer = hotels_buffer()
+    search = Search(command=user.current_command, city=user.city, check_in=user.check_in,
+                    check_out=user.check_out, date_of_command=datetime.now())
+    search.results = [SearchResult(hotel_id=hotel.hotel_id, name=hotel.name, price=hotel.price,
+                                   rating=hotel.rating, remoteness=hotel.remoteness)
+                      for hotel in list(user.current_buffer.values())[:user.hotels_count]]
+
+    texts = benchmark(render_search, search)
+    assert len(texts) == 1
@@ -0,0 +1,179 @@
+"""Common fixtures of the benchmark suite.
+
+The benchmarks run the real parsing, ranking and rendering code of the bot
+against the recorded RapidAPI payloads from the fixtures directory. Outgoing
+Telegram calls are answered locally and the history tables live in a
+temporary database, so only the bot's own code is measured"""
+
+import json
+import os
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+os.environ.setdefault('BOT_TOKEN', '123456:benchmark')
+os.environ.setdefault('RAPID_API_KEY', 'benchmark')
+
+import handlers  # noqa: E402  (loads the handlers in the same order as main.py)
+from loader import my_bot  # noqa: E402
+from logger.logger import logger  # noqa: E402
+from models.data_class import UserData  # noqa: E402
+from models.database import db, User, Search, SearchResult, Destination, Session  # noqa: E402
+from requests.models import Response  # noqa: E402
+from telebot.types import Message  # noqa: E402
+from utils.rate_limiter import QueuedCall  # noqa: E402
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+BASELINES = Path(__file__).parent / '.baselines'
+CHAT_ID = 42
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config) -> None:
+    """Turns off the comparison with the baseline until the first one is saved
+    (python -m pytest benchmarks --benchmark-save=baseline)"""
+
+    if not any(BASELINES.glob('*/*.json')):
+        config.option.benchmark_compare = []
+        config.option.benchmark_compare_fail = None
+
+
+def load_fixture(name: str) -> bytes:
+    """Returns the raw content of the recorded payload
+
+    :param: name: file name in the fixtures directory
+    :type: name: string
+    :return: raw payload
+    :rtype: bytes"""
+
+    return (FIXTURES / name).read_bytes()
+
+
+def make_response(name: str) -> Response:
+    """Builds the requests response object with the recorded payload as its body
+
+    :param: name: file name in the fixtures directory
+    :type: name: string
+    :return: response with status code 200
+    :rtype: Response object"""
+
+    response = Response()
+    response.status_code = 200
+    response._content = load_fixture(name)
+    response.encoding = 'utf-8'
+    return response
+
+
+def make_message(text: str = 'benchmark', message_id: int = 1) -> Message:
+    """Builds the telegram message of the benchmark user
+
+    :param: text: text of the message
+    :type: text: string
+    :param: message_id: id of the message
+    :type: message_id: integer
+    :return: message
+    :rtype: Message object"""
+
+    return Message.de_json({
+        'message_id': message_id,
+        'date': 0,
+        'chat': {'id': CHAT_ID, 'type': 'private'},
+        'from': {'id': CHAT_ID, 'is_bot': False, 'first_name': 'Benchmark'},
+        'text': text
+    })
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_log(tmp_path_factory) -> None:
+    """Redirects the log of the bot to the temporary file (the benchmarks do not write
+    to the production log)"""
+
+    logger.remove()
+    logger.add(str(tmp_path_factory.mktemp('logger') / 'log_file.log'))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_database(tmp_path_factory) -> None:
+    """Binds the history tables to the temporary database"""
+
+    db.init(str(tmp_path_factory.mktemp('database') / 'hotels.db'))
+    with db:
+        db.create_tables([User, Search, SearchResult, Destination, Session])
+        User.create(chat_id=CHAT_ID)
+    yield
+    db.close()
+
+
+@pytest.fixture(autouse=True)
+def offline_bot(monkeypatch) -> None:
+    """Answers all the outgoing Telegram calls locally with a sent message
+    (the scheduled calls are returned already made)"""
+
+    def sent_message(*args, **kwargs) -> Message:
+        return make_message()
+
+    def made_call(*args, **kwargs) -> QueuedCall:
+        call = QueuedCall(CHAT_ID, (0, 0), sent_message, args, kwargs)
+        call.set_result(make_message())
+        return call
+
+    for method in ('send_message', 'send_video', 'send_media_group', 'delete_message',
+                   'edit_message_text', 'edit_message_reply_markup'):
+        monkeypatch.setattr(my_bot, method, made_call)
+    monkeypatch.setattr(my_bot, 'answer_callback_query', sent_message)
+
+
+@pytest.fixture
+def message() -> Message:
+    """Message of the benchmark user"""
+
+    return make_message()
+
+
+@pytest.fixture
+def user(message) -> UserData:
+    """Benchmark user with the parameters of a completed search"""
+
+    current_user = UserData.get_user(message.chat.id)
+    current_user.clear_all()
+    current_user.user_name = 'Benchmark'
+    current_user.hotel_id = '1000000'
+    current_user.current_command = '/lowprice'
+    current_user.city = 'москва'
+    current_user.destination_id = '2734'
+    current_user.hotels_count = 5
+    current_user.photo_count = 5
+    current_user.adults_count = '2'
+    current_user.check_in = date(2026, 11, 1)
+    current_user.check_out = date(2026, 11, 4)
+    current_user.minimum_price = 50
+    current_user.maximum_price = 400
+    current_user.minimum_distance = 1
+    current_user.maximum_distance = 10
+    return current_user
+
+
+@pytest.fixture
+def hotels_buffer(user, message) -> Callable[[], OrderedDict]:
+    """Returns the factory of the hotels buffer parsed from the 200 properties payload"""
+
+    from handlers.handlers_for_request_and_after.rapidapi import gets_main_hotels_data
+
+    user.third_condition = True
+    gets_main_hotels_data(response=make_response('properties.json'), user=user, message=message)
+    parsed: OrderedDict = user.current_buffer
+
+    def factory() -> OrderedDict:
+        return OrderedDict(parsed)
+
+    return factory
+
+
+@pytest.fixture
+def summary() -> Dict[str, Any]:
+    """Decoded payload of the hotel's summary"""
+
+    return json.loads(load_fixture('summary.json'))
@@ -2,13 +2,63 @@ import os
 
 from dotenv import load_dotenv, find_dotenv
 
-if not find_dotenv():
+if not find_dotenv() and os.getenv('BOT_TOKEN') is None:
     exit('Переменные окружения не загружены т.к отсутствует файл .env')
 else:
     load_dotenv()
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 RAPID_API_KEY = os.getenv('RAPID_API_KEY')
+BOT_THREADS = int(os.getenv('BOT_THREADS', 2))
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', 5))
+SUMMARY_TIMEOUT = int(os.getenv('SUMMARY_TIMEOUT', 10))
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 2))
+PREFETCH_BUDGET = int(os.getenv('PREFETCH_BUDGET', 10))
+PROPERTIES_TIMEOUT = int(os.getenv('PROPERTIES_TIMEOUT', 15))
+LOCATIONS_TIMEOUT = int(os.getenv('LOCATIONS_TIMEOUT', 10))
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 4))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+MEDIA_CACHE_SIZE = int(os.getenv('MEDIA_CACHE_SIZE', 4096))
+QUOTA_DAILY = int(os.getenv('QUOTA_DAILY', 1000))
+QUOTA_PER_MINUTE = int(os.getenv('QUOTA_PER_MINUTE', 60))
+QUOTA_USER_DAILY = int(os.getenv('QUOTA_USER_DAILY', 150))
+QUOTA_RESERVE = float(os.getenv('QUOTA_RESERVE', 0.2))
+SPECULATIVE_NIGHTS = int(os.getenv('SPECULATIVE_NIGHTS', 1))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', 5))
+TELEGRAM_WORKERS = int(os.getenv('TELEGRAM_WORKERS', 4))
+TELEGRAM_CHAT_BUCKETS = int(os.getenv('TELEGRAM_CHAT_BUCKETS', 10000))
+PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', 1))
+DATABASE_PATH = os.getenv('DATABASE_PATH', './database/hotels.db')
+DATABASE_RESET = os.getenv('DATABASE_RESET', '0') == '1'
+DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite+pool:///{DATABASE_PATH}')
+DATABASE_MAX_CONNECTIONS = int(os.getenv('DATABASE_MAX_CONNECTIONS', 16))
+DATABASE_STALE_TIMEOUT = int(os.getenv('DATABASE_STALE_TIMEOUT', 600))
+DATABASE_TIMEOUT = int(os.getenv('DATABASE_TIMEOUT', 10))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 100))
+HISTORY_SEEN_LIMIT = int(os.getenv('HISTORY_SEEN_LIMIT', 10000))
+HISTORY_TTL_DAYS = int(os.getenv('HISTORY_TTL_DAYS', 90))
+MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', 500))
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', 3600))
+ANALYZE_INTERVAL = int(os.getenv('ANALYZE_INTERVAL', 6 * 3600))
+VACUUM_INTERVAL = int(os.getenv('VACUUM_INTERVAL', 7 * 24 * 3600))
+DESTINATIONS_SEED = os.getenv('DESTINATIONS_SEED', './database/destinations.json')
+DESTINATIONS_LIMIT = int(os.getenv('DESTINATIONS_LIMIT', 10))
+DESTINATIONS_MIN_QUERY = int(os.getenv('DESTINATIONS_MIN_QUERY', 3))
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', 0.5))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 300))
+INLINE_MISS_CACHE_TIME = int(os.getenv('INLINE_MISS_CACHE_TIME', 5))
+INLINE_WORKERS = int(os.getenv('INLINE_WORKERS', 2))
+SESSION_TTL_HOURS = int(os.getenv('SESSION_TTL_HOURS', 24))
+RENDER_MODE = os.getenv('RENDER_MODE', 'compact')
 DEFAULT_COMMANDS = (
     ('start', "Запустить бота"),
     ('help', "Вывести справку"),
@@ -1,84 +1,260 @@
-from peewee import DoesNotExist
+import csv
+import io
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple
+
+from peewee import fn, prefetch
+from playhouse.migrate import SchemaMigrator, migrate
 from telebot.types import Message
 
+import config
+from database import history, users
 from loader import my_bot
-from logger.logger import logger_wraps
-from models.data_class import UserData
-from models.database import db, User, HotelSearch
+from logger.logger import logger_wraps, logger
+from models.database import db, User, Search, SearchResult, MediaFile, Destination, Session
+from models.hotel import hotel_url
+from utils import templates
+
+known_file_ids: 'OrderedDict[str, str]' = OrderedDict()
+known_file_ids_lock = threading.Lock()
+EXPORT_COLUMNS: Tuple[str, ...] = ('command', 'date_of_command', 'city', 'check_in', 'check_out',
+                                   'hotel_id', 'name', 'price', 'rating', 'remoteness', 'url')
+EXPORT_FORMATS: Tuple[str, ...] = ('csv', 'json')
+# the tables of the earlier versions of the bot, which are not used any more
+LEGACY_TABLES: Tuple[str, ...] = ('hotelsearch',)
 
 
 @logger_wraps()
 def create_database() -> None:
-    """Resets database tables and creates them
+    """Creates the database tables, if they do not exist yet. The tables of the users and
+    of the history are reset only if DATABASE_RESET is turned on (the tables of the media file ids,
+    of the destinations and of the search sessions are never reset). The tables kept
+    from the earlier versions of the bot are migrated
 
     :return: None"""
 
     with db:
-        db.drop_tables([User, HotelSearch])
-        db.create_tables([User, HotelSearch])
+        for table in LEGACY_TABLES:
+            if db.table_exists(table):
+                db.execute_sql(f'DROP TABLE {table}')
+        if config.DATABASE_RESET:
+            db.drop_tables([User, Search, SearchResult])
+        elif User.table_exists():
+            migrate_users()
+        db.create_tables([User, Search, SearchResult], safe=True)
+        db.create_tables([MediaFile, Destination, Session], safe=True)
+    users.known_users.clear()
+
+
+def migrate_users() -> None:
+    """Adds the unique index of the chat ids to the users table created by the earlier
+    versions of the bot. The duplicated users are merged first (their searches are moved
+    to the first of them), otherwise the index could not be created. It is called
+    in the transaction of create_database before the tables are created
+
+    :return: None"""
+
+    table: str = User._meta.table_name
+    if any(index.unique and index.columns == ['chat_id'] for index in db.get_indexes(table)):
+        return
+    searches: bool = Search.table_exists()
+    duplicates: List[User] = list(User.select(User.chat_id, fn.MIN(User.id).alias('first'))
+                                  .group_by(User.chat_id)
+                                  .having(fn.COUNT(User.id) > 1))
+    for duplicate in duplicates:
+        others: List[int] = [user_id for user_id, in User.select(User.id).where(
+            (User.chat_id == duplicate.chat_id) & (User.id != duplicate.first)).tuples()]
+        if searches:
+            Search.update(users_information=duplicate.first).where(
+                Search.users_information.in_(others)).execute()
+        User.delete().where(User.id.in_(others)).execute()
+    migrate(SchemaMigrator.from_database(db).add_index(table, ('chat_id',), unique=True))
+    logger.info(f'the unique index of the users chat ids is added ({len(duplicates)} duplicated users merged)')
 
 
 @logger_wraps()
 def add_user_to_database(message: Message) -> None:
     """Adds a user to the database (if he is not exists). If a user
-     with such chat_id is already in the database, then nothing happens
+    with such chat_id is already registered, then nothing happens
+    (no queries to the database are made)
 
     :param message: current message
     :type message: Message object
     :return: None"""
 
-    with db:
-        try:
-            User.get(User.chat_id == message.chat.id)
-        except DoesNotExist:
-            User.create(chat_id=message.chat.id)
+    users.register(message.chat.id)
 
 
 @logger_wraps()
-def add_results_to_database(message: Message, result: str) -> None:
-    """Adds the result of the entered command to the database
+def pull_from_database(message: Message) -> None:
+    """Retrieves the searches of the user with their displayed hotels from the database
+    (two queries) and displays each search in one message, rendered by the history templates.
+    If there are no searches yet, a message about the absence of data in the database
+    is displayed. The results, which are still in the queue of the history writer,
+    are written first
 
-    :param: result: the result of the entered command (one of the found hotels)
-    :type: result: string
-    :param: message: current message
-    :type: message: Message object
-    :return: None
-    """
+    :param message: current message
+    :type message: Message object
+    :return: None"""
 
-    current_user = UserData.get_user(message.chat.id)
+    history.flush()
     with db:
-        user = User.get(User.chat_id == message.chat.id)
-        HotelSearch.create(
-            users_information=user.id,
-            command=current_user.current_command,
-            result_of_command=result + f'\nСайт отеля '
-                                       f'https://hotels.com/h{current_user.hotel_id}.Hotel-information'
+        searches = prefetch(
+            Search.select().join(User).where(User.chat_id == message.chat.id).order_by(Search.id),
+            SearchResult.select().order_by(SearchResult.id)
         )
+    if not searches:
+        my_bot.send_message(chat_id=message.chat.id,
+                            text='*В настоящее время здесь ничего нет)*',
+                            parse_mode='Markdown')
+    for search in searches:
+        for text in templates.render_search(search):
+            my_bot.send_message(chat_id=message.chat.id, text=text,
+                                disable_web_page_preview=True, parse_mode='Markdown')
 
 
 @logger_wraps()
-def pull_from_database(message: Message) -> None:
-    """Retrieves results of the entered commands from the database.
-    If there is an attempt to call the history command at the very beginning
-    of the script call, an exception is processed and a message
-    about the absence of data in the database is displayed.
+def export_history(message: Message, file_format: str = 'csv') -> None:
+    """Sends the whole history of the user as a single document (one row per displayed hotel).
+    The rows are read from the database one by one (without caching the query results)
+    and written to a temporary file, so the memory does not depend on the size of the history
 
     :param message: current message
     :type message: Message object
+    :param: file_format: format of the document (csv or json)
+    :type: file_format: string
     :return: None"""
 
-    try:
-        HotelSearch.get()
-        all_results = HotelSearch.select(
-            HotelSearch, User).join(User).where(User.chat_id == message.chat.id)
-        for i_element in all_results:
-            my_bot.send_message(chat_id=message.chat.id,
-                                text=f'*Команда: {i_element.command}\n*'
-                                     f'*Дата и время введения введения: {i_element.date_of_command}\n\n*'
-                                     f'{i_element.result_of_command}\n', disable_web_page_preview=True,
-                                parse_mode='Markdown')
-
-    except DoesNotExist:
-        my_bot.send_message(chat_id=message.chat.id,
-                            text='*В настоящее время здесь ничего нет)*',
-                            parse_mode='Markdown')
+    history.flush()
+    query = (SearchResult
+             .select(Search.command, Search.date_of_command, Search.city, Search.check_in,
+                     Search.check_out, SearchResult.hotel_id, SearchResult.name,
+                     SearchResult.price, SearchResult.rating, SearchResult.remoteness)
+             .join(Search).join(User)
+             .where(User.chat_id == message.chat.id)
+             .order_by(SearchResult.id)
+             .tuples())
+    with tempfile.TemporaryFile() as document:
+        text = io.TextIOWrapper(document, encoding='utf-8', newline='')
+        try:
+            with db:
+                rows = export_rows(query.iterator())
+                count = write_json(text, rows) if file_format == 'json' else write_csv(text, rows)
+            text.flush()
+            if not count:
+                my_bot.send_message(chat_id=message.chat.id,
+                                    text='*В настоящее время здесь ничего нет)*',
+                                    parse_mode='Markdown')
+                return
+            document.seek(0)
+            my_bot.send_document(chat_id=message.chat.id, document=document,
+                                 visible_file_name=f'history.{file_format}',
+                                 caption=f'Найдено отелей: {count}').result()
+        finally:
+            text.detach()
+
+
+def export_rows(rows: Iterator[tuple]) -> Iterator[tuple]:
+    """Converts the rows of the history to the exported values (the dates in ISO format
+    and the url of the hotel is added)"""
+
+    for row in rows:
+        yield tuple(value.isoformat() if hasattr(value, 'isoformat') else value
+                    for value in row) + (hotel_url(row[5]),)
+
+
+def write_csv(file: io.TextIOBase, rows: Iterator[tuple]) -> int:
+    """Writes the rows to the file in CSV format and returns their number"""
+
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+    count: int = 0
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+    return count
+
+
+def write_json(file: io.TextIOBase, rows: Iterator[tuple]) -> int:
+    """Writes the rows to the file as a JSON array of objects and returns their number"""
+
+    file.write('[')
+    count: int = 0
+    for count, row in enumerate(rows, start=1):
+        if count > 1:
+            file.write(',')
+        file.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+    file.write(']')
+    return count
+
+
+@logger_wraps()
+def get_file_ids(sources: List[str]) -> Dict[str, str]:
+    """Returns the Telegram file ids of the media that have already been sent. The file ids
+    are looked up in memory first and then in the database
+
+    :param: sources: urls of the media
+    :type: sources: list with strings
+    :return: file ids by the urls of the media (only for the found ones)
+    :rtype: Dictionary[str, str]"""
+
+    with known_file_ids_lock:
+        file_ids = {source: known_file_ids[source] for source in sources
+                    if source in known_file_ids}
+    missing = [source for source in sources if source not in file_ids]
+    if missing:
+        with db:
+            found = {media_file.source: media_file.file_id
+                     for media_file in MediaFile.select().where(MediaFile.source.in_(missing))}
+        file_ids.update(found)
+    remember_file_ids(file_ids)
+    return file_ids
+
+
+def remember_file_ids(file_ids: Dict[str, str]) -> None:
+    """Keeps the recently used file ids in memory (at most MEDIA_CACHE_SIZE of them,
+    the least recently used ones are forgotten first)
+
+    :param: file_ids: file ids by the urls of the media
+    :type: file_ids: Dictionary[str, str]
+    :return: None"""
+
+    with known_file_ids_lock:
+        for source, file_id in file_ids.items():
+            known_file_ids[source] = file_id
+            known_file_ids.move_to_end(source)
+        while len(known_file_ids) > config.MEDIA_CACHE_SIZE:
+            known_file_ids.popitem(last=False)
+
+
+@logger_wraps()
+def add_file_ids(file_ids: Dict[str, str]) -> None:
+    """Saves the Telegram file ids of the sent media
+
+    :param: file_ids: file ids by the urls of the media
+    :type: file_ids: Dictionary[str, str]
+    :return: None"""
+
+    remember_file_ids(file_ids)
+    with db:
+        MediaFile.insert_many(
+            [{'source': source, 'file_id': file_id} for source, file_id in file_ids.items()]
+        ).on_conflict(conflict_target=[MediaFile.source],
+                      preserve=[MediaFile.file_id]).execute()
+
+
+@logger_wraps()
+def delete_file_ids(sources: List[str]) -> None:
+    """Forgets the Telegram file ids of the media (if Telegram does not accept them anymore)
+
+    :param: sources: urls of the media
+    :type: sources: list with strings
+    :return: None"""
+
+    with known_file_ids_lock:
+        for source in sources:
+            known_file_ids.pop(source, None)
+    with db:
+        MediaFile.delete().where(MediaFile.source.in_(sources)).execute()
@@ -0,0 +1,199 @@
+"""Destination index.
+
+The destinations found by the API (and the ones from the optional seed file)
+are kept in the prefix tree by the words of their names, so the city entered
+by the user is looked up without a request to the API: the destinations, one
+of whose names starts with the entered text, are offered in the order of their
+popularity (the number of the searches in them). The index answers only if
+the entered text is a whole word of one of the found names (e.g. "рим" does not
+stop at "Римини"), otherwise the API is requested"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from logger.logger import logger_wraps, logger
+from models.database import db, Destination
+from utils import metrics
+
+
+class TrieNode:
+    """Node of the prefix tree
+
+    :param: children: next nodes by the letters
+    :type: children: dictionary with strings as keys and TrieNode as values
+    :param: ids: ids of the destinations, whose names start with the prefix of the node
+    :type: ids: set with strings"""
+
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children: Dict[str, 'TrieNode'] = dict()
+        self.ids: Set[str] = set()
+
+
+class DestinationIndex:
+    """Prefix tree of the destination names
+
+    :param: root: root node of the tree
+    :type: root: TrieNode
+    :param: names: full names of the destinations by their ids
+    :type: names: dictionary with strings as keys and values
+    :param: popularity: number of the searches by the ids of the destinations
+    :type: popularity: dictionary with strings as keys and integers as values"""
+
+    def __init__(self):
+        self.root = TrieNode()
+        self.names: Dict[str, str] = dict()
+        self.popularity: Dict[str, int] = dict()
+        self.lock = threading.Lock()
+
+    def add(self, source_id: str, full_name: str, short_name: Optional[str] = None,
+            popularity: int = 0) -> None:
+        """Adds the destination, each prefix of its names (starting from any word) leads to it"""
+
+        with self.lock:
+            self.names[source_id] = full_name
+            self.popularity[source_id] = max(popularity, self.popularity.get(source_id, 0))
+            for name in {normalize(full_name), normalize(short_name or '')}:
+                for start in word_starts(name):
+                    node = self.root
+                    for letter in name[start:]:
+                        node = node.children.setdefault(letter, TrieNode())
+                        node.ids.add(source_id)
+
+    def search(self, prefix: str) -> List[Tuple[str, str]]:
+        """Returns the names and the ids of the destinations, which start with the prefix,
+        the most popular first (then the ones, whose full name starts with the prefix)"""
+
+        with self.lock:
+            node: Optional[TrieNode] = self.root
+            for letter in prefix:
+                node = node.children.get(letter)
+                if node is None:
+                    return []
+            ids = sorted(node.ids, key=lambda source_id: (
+                -self.popularity[source_id],
+                not normalize(self.names[source_id]).startswith(prefix),
+                self.names[source_id]
+            ))
+            return [(self.names[source_id], source_id) for source_id in ids[:config.DESTINATIONS_LIMIT]]
+
+    def select(self, source_id: str) -> None:
+        """Counts the search in the destination"""
+
+        with self.lock:
+            if source_id in self.popularity:
+                self.popularity[source_id] += 1
+
+
+index = DestinationIndex()
+
+
+def normalize(text: str) -> str:
+    """Returns the text in the form, in which the names are indexed"""
+
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def word_starts(name: str) -> Iterable[int]:
+    """Returns the positions where the words of the name start"""
+
+    return (match.start() for match in re.finditer(r'\w+', name))
+
+
+@logger_wraps()
+def load_destinations() -> None:
+    """Fills the index with the saved destinations and the ones from the seed file, if there is one
+    (called once when the bot is started)
+
+    :return: None"""
+
+    if os.path.exists(config.DESTINATIONS_SEED):
+        with open(config.DESTINATIONS_SEED, encoding='utf-8') as seed:
+            suggestions = json.load(seed)
+        save_destinations(suggestions.get('sr', []) if isinstance(suggestions, dict) else suggestions)
+    with db:
+        for destination in Destination.select():
+            index.add(destination.source_id, destination.full_name, destination.short_name,
+                      destination.popularity)
+    logger.info(f'{len(index.names)} destinations are loaded')
+
+
+def lookup(city: str) -> Optional[List[Tuple[str, str]]]:
+    """Returns the destinations for the entered city from the index
+
+    :param: city: the entered city
+    :type: city: string
+    :return: names and ids of the destinations or None, if the API should be requested
+    :rtype: list with the pairs of strings"""
+
+    query: str = normalize(city)
+    if len(query) < config.DESTINATIONS_MIN_QUERY:
+        return None
+    found: List[Tuple[str, str]] = index.search(query)
+    whole_word = re.compile(rf'(?<!\w){re.escape(query)}(?!\w)')
+    if not any(whole_word.search(normalize(name)) for name, _ in found):
+        metrics.increment('destinations_misses')
+        return None
+    metrics.increment('destinations_hits')
+    return found
+
+
+def suggest(text: str) -> List[Tuple[str, str]]:
+    """Returns the destinations, one of whose names starts with the text
+    (the suggestions while the user is typing)
+
+    :param: text: the typed text
+    :type: text: string
+    :return: names and ids of the destinations
+    :rtype: list with the pairs of strings"""
+
+    query: str = normalize(text)
+    if len(query) < config.DESTINATIONS_MIN_QUERY:
+        return []
+    return index.search(query)
+
+
+def save_destinations(suggestions: List[Dict]) -> None:
+    """Adds the destinations found by the API to the index and saves them
+    (the suggestions without the name or the id are skipped)
+
+    :param: suggestions: the raw suggestions of the locations endpoint
+    :type: suggestions: list with dictionaries
+    :return: None"""
+
+    rows: List[Dict[str, str]] = [
+        {
+            'source_id': suggestion.get('essId', {}).get('sourceId'),
+            'full_name': suggestion.get('regionNames', {}).get('fullName'),
+            'short_name': suggestion.get('regionNames', {}).get('shortName')
+        }
+        for suggestion in suggestions
+    ]
+    rows = [row for row in rows if row['source_id'] is not None and row['full_name'] is not None]
+    if not rows:
+        return
+    for row in rows:
+        index.add(**row)
+    with db:
+        Destination.insert_many(rows).on_conflict(
+            conflict_target=[Destination.source_id],
+            preserve=[Destination.full_name, Destination.short_name]
+        ).execute()
+
+
+def select_destination(source_id: str) -> None:
+    """Counts the search in the selected destination
+
+    :param: source_id: id of the destination
+    :type: source_id: string
+    :return: None"""
+
+    index.select(source_id)
+    with db:
+        Destination.update(popularity=Destination.popularity + 1).where(
+            Destination.source_id == source_id).execute()
@@ -0,0 +1,193 @@
+"""Search history pipeline.
+
+Displaying a hotel only puts the "hotel shown" event into the queue. The
+writer thread takes the events in batches, drops the repeated ones (the same
+hotel shown again during the same search) and writes the rest to the database
+in one transaction, so the messages are not waiting for the disk. The search
+row is written with the first hotel of the search, the hotels are written as
+the result rows (the descriptions are rendered when the history is displayed)"""
+
+import atexit
+import itertools
+import queue
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from telebot.types import Message
+
+import config
+from database import users
+from logger.logger import logger
+from models.data_class import UserData
+from models.database import db, Search, SearchResult
+from models.hotel import Hotel
+
+search_counter = itertools.count(1)
+
+
+class SearchParameters(NamedTuple):
+    """The parameters of the search, which are saved in the history"""
+
+    command: str
+    city: Optional[str]
+    check_in: Optional[date]
+    check_out: Optional[date]
+    adults_count: Optional[int]
+    minimum_price: Optional[int]
+    maximum_price: Optional[int]
+    minimum_distance: Optional[int]
+    maximum_distance: Optional[int]
+
+
+class HotelShown(NamedTuple):
+    """The event of displaying the hotel to the user
+
+    :param: chat_id: id of the user's chat
+    :type: chat_id: integer
+    :param: search_id: number of the user's search (unique while the bot is running)
+    :type: search_id: integer
+    :param: search: parameters of the search
+    :type: search: SearchParameters
+    :param: hotel: record of the hotel
+    :type: hotel: Hotel"""
+
+    chat_id: int
+    search_id: int
+    search: SearchParameters
+    hotel: Hotel
+
+
+events: 'queue.Queue[HotelShown]' = queue.Queue()
+seen: 'OrderedDict[Tuple[int, int, str], None]' = OrderedDict()
+search_rows: 'OrderedDict[Tuple[int, int], int]' = OrderedDict()
+writer_lock = threading.Lock()
+writer: Optional[threading.Thread] = None
+
+
+def hotel_shown(message: Message, hotel: Hotel) -> None:
+    """Puts the event of displaying the hotel into the queue of the history writer
+    (the writer thread is started on the first event)
+
+    :param message: current message
+    :type message: Message object
+    :param: hotel: record of the displayed hotel
+    :type: hotel: Hotel
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if current_user.search_id is None:
+        current_user.search_id = next(search_counter)
+    start_writer()
+    events.put(HotelShown(message.chat.id, current_user.search_id, search_parameters(current_user), hotel))
+
+
+def search_parameters(user: UserData) -> SearchParameters:
+    """Returns the parameters of the user's current search (the ranges of the price
+    and the distance are set only for /bestdeal)"""
+
+    return SearchParameters(
+        command=user.current_command,
+        city=user.city,
+        check_in=user.check_in,
+        check_out=user.check_out,
+        adults_count=int(user.adults_count) if user.adults_count else None,
+        minimum_price=getattr(user, 'minimum_price', None),
+        maximum_price=getattr(user, 'maximum_price', None),
+        minimum_distance=getattr(user, 'minimum_distance', None),
+        maximum_distance=getattr(user, 'maximum_distance', None)
+    )
+
+
+def start_writer() -> None:
+    """Starts the writer thread, if it is not running yet"""
+
+    global writer
+    if writer is not None:
+        return
+    with writer_lock:
+        if writer is None:
+            writer = threading.Thread(target=write_history, name='history', daemon=True)
+            writer.start()
+
+
+def write_history() -> None:
+    """Loop of the writer thread: waits for the events and writes them in batches"""
+
+    while True:
+        batch: List[HotelShown] = [events.get()]
+        while len(batch) < config.HISTORY_BATCH_SIZE:
+            try:
+                batch.append(events.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            write_batch(batch)
+        except Exception:
+            logger.exception('ups... the history is not saved')
+        finally:
+            for _ in batch:
+                events.task_done()
+
+
+def write_batch(batch: List[HotelShown]) -> None:
+    """Writes the events, which have not been written yet, to the database. The events
+    and the search rows are remembered as written only after the transaction succeeds
+
+    :param: batch: events of displaying the hotels
+    :type: batch: list with HotelShown
+    :return: None"""
+
+    new_events: 'OrderedDict[Tuple[int, int, str], HotelShown]' = OrderedDict()
+    for event in batch:
+        key = (event.chat_id, event.search_id, event.hotel.hotel_id)
+        if key not in seen:
+            new_events.setdefault(key, event)
+    if not new_events:
+        return
+
+    # the users are registered in their own transactions (the registry keeps only the written ones)
+    user_ids: Dict[int, int] = {event.chat_id: users.register(event.chat_id) for event in new_events.values()
+                                if (event.chat_id, event.search_id) not in search_rows}
+    new_searches: Dict[Tuple[int, int], int] = dict()
+    with db:
+        for event in new_events.values():
+            search = (event.chat_id, event.search_id)
+            if search not in search_rows and search not in new_searches:
+                new_searches[search] = Search.create(users_information=user_ids[event.chat_id],
+                                                     **event.search._asdict()).id
+        rows = [
+            {
+                'search': new_searches.get((event.chat_id, event.search_id))
+                or search_rows[(event.chat_id, event.search_id)],
+                'hotel_id': event.hotel.hotel_id,
+                'name': event.hotel.name,
+                'price': event.hotel.price,
+                'rating': event.hotel.rating,
+                'remoteness': event.hotel.remoteness
+            }
+            for event in new_events.values()
+        ]
+        SearchResult.insert_many(rows).execute()
+
+    for search, search_id in new_searches.items():
+        search_rows[search] = search_id
+        if len(search_rows) > config.HISTORY_SEEN_LIMIT:
+            search_rows.popitem(last=False)
+    for key in new_events:
+        seen[key] = None
+        if len(seen) > config.HISTORY_SEEN_LIMIT:
+            seen.popitem(last=False)
+
+
+def flush() -> None:
+    """Waits until all the queued events are written (e.g. before the history is displayed)
+
+    :return: None"""
+
+    if writer is not None:
+        events.join()
+
+
+atexit.register(flush)
@@ -0,0 +1,136 @@
+"""Maintenance of the history database.
+
+The jobs are run by a single daemon thread outside of the bot handlers: the old
+searches are deleted in small batches (each batch is a short transaction, so the
+history writer is not blocked for long), the search sessions, which have not
+been continued for SESSION_TTL_HOURS, are deleted, the statistics of the query
+planner are refreshed and the database file is compacted from time to time"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from peewee import PostgresqlDatabase
+
+import config
+from logger.logger import logger
+from models.database import db, Search, SearchResult, Session
+
+
+class Job:
+    """The periodic maintenance job
+
+    :param: name: name of the job (for the log)
+    :type: name: string
+    :param: function: the job itself
+    :type: function: Callable
+    :param: interval: seconds between the runs of the job
+    :type: interval: float
+    :param: next_run: the moment of the next run (time.monotonic)
+    :type: next_run: float"""
+
+    def __init__(self, name: str, function: Callable[[], None], interval: float):
+        self.name: str = name
+        self.function: Callable[[], None] = function
+        self.interval: float = interval
+        self.next_run: float = time.monotonic() + interval
+
+
+def prune_history() -> int:
+    """Deletes the searches, which are older than HISTORY_TTL_DAYS, with their displayed hotels.
+    The searches are deleted in batches of MAINTENANCE_BATCH_SIZE, one transaction per batch
+
+    :return: number of the deleted searches
+    :rtype: integer"""
+
+    expired: datetime = datetime.now() - timedelta(days=config.HISTORY_TTL_DAYS)
+    deleted: int = 0
+    while True:
+        with db:
+            ids: List[int] = [search.id for search in Search.select(Search.id)
+                              .where(Search.date_of_command < expired)
+                              .order_by(Search.id)
+                              .limit(config.MAINTENANCE_BATCH_SIZE)]
+            if not ids:
+                return deleted
+            SearchResult.delete().where(SearchResult.search.in_(ids)).execute()
+            deleted += Search.delete().where(Search.id.in_(ids)).execute()
+        if len(ids) < config.MAINTENANCE_BATCH_SIZE:
+            return deleted
+
+
+def prune_sessions() -> int:
+    """Deletes the search sessions, which have not been checkpointed during SESSION_TTL_HOURS
+    (they are not restored any more)
+
+    :return: number of the deleted sessions
+    :rtype: integer"""
+
+    expired: datetime = datetime.now() - timedelta(hours=config.SESSION_TTL_HOURS)
+    with db:
+        return Session.delete().where(Session.updated < expired).execute()
+
+
+def analyze() -> None:
+    """Refreshes the statistics, which are used by the query planner"""
+
+    with db.connection_context():
+        db.execute_sql('ANALYZE')
+
+
+def vacuum() -> None:
+    """Rebuilds the database file, returning the space of the deleted rows
+    (VACUUM can not be run inside a transaction, so PostgreSQL connection
+    is switched to the autocommit mode for it)"""
+
+    with db.connection_context():
+        if isinstance(db, PostgresqlDatabase):
+            connection = db.connection()
+            connection.autocommit = True
+            try:
+                db.execute_sql('VACUUM')
+            finally:
+                connection.autocommit = False
+        else:
+            db.execute_sql('VACUUM')
+
+
+jobs: List[Job] = [
+    Job('prune history', prune_history, config.MAINTENANCE_INTERVAL),
+    Job('prune sessions', prune_sessions, config.MAINTENANCE_INTERVAL),
+    Job('analyze', analyze, config.ANALYZE_INTERVAL),
+    Job('vacuum', vacuum, config.VACUUM_INTERVAL)
+]
+scheduler: Optional[threading.Thread] = None
+
+
+def run_jobs() -> None:
+    """Loop of the scheduler thread: runs the jobs, which are due, and sleeps until the next one"""
+
+    while True:
+        for job in jobs:
+            if time.monotonic() < job.next_run:
+                continue
+            try:
+                started: float = time.monotonic()
+                result = job.function()
+                logger.info(f'maintenance job "{job.name}" is done in '
+                            f'{time.monotonic() - started:.2f} s' +
+                            (f' ({result} rows)' if result is not None else ''))
+            except Exception:
+                logger.exception(f'ups... maintenance job "{job.name}" failed')
+            job.next_run = time.monotonic() + job.interval
+        time.sleep(max(min(job.next_run for job in jobs) - time.monotonic(), 0))
+
+
+def start_maintenance() -> None:
+    """Starts the scheduler thread (called once when the bot is started)
+
+    :return: None"""
+
+    global scheduler
+    if scheduler is None:
+        scheduler = threading.Thread(target=run_jobs, name='maintenance', daemon=True)
+        scheduler.start()
+
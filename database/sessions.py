@@ -0,0 +1,273 @@
+"""Resumable search sessions.
+
+After every handled update the search of the chat is checkpointed: the compact
+snapshot of the user data (the state flags, the search parameters, the position
+of the displayed hotel, the found cities or hotels and the pending next step
+handlers) is compared with the last saved one and, if it has changed, is written
+to the database by the writer thread. When the bot is restarted, nothing is
+loaded at once: the session of the chat is restored on its first update (the
+next step handler is registered again before the message is dispatched), so the
+user continues the search from the same step, and the found hotels are shown
+without new requests to the API. The prefetched summaries and the rendered
+descriptions are not saved, the continued search gets a new row in the history"""
+
+import atexit
+import importlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telebot import Handler
+from telebot.handler_backends import MemoryHandlerBackend
+from telebot.types import CallbackQuery, Message
+
+import config
+from logger.logger import logger
+from models.data_class import UserData
+from models.database import db, Session
+from models.hotel import Hotel
+from utils import metrics
+from utils.rate_limiter import ScheduledTeleBot
+
+FIELDS: Tuple[str, ...] = ('user_name', 'current_command', 'city', 'hotels_count', 'hotel_id',
+                           'current_hotel_index', 'destination_id', 'answer_about_photo', 'photo_count',
+                           'adults_count', 'minimum_price', 'maximum_price', 'minimum_distance',
+                           'maximum_distance', 'id_message_for_delete', 'kept_keyboard')
+FLAGS: Tuple[str, ...] = ('date_flag', 'zero_condition', 'first_condition', 'second_condition',
+                          'third_condition', 'intermediate_condition', 'fourth_condition',
+                          'continue_searching', 'fifth_condition', 'delete_message',
+                          'start_from_the_beginning_if_there_is_something_to_show',
+                          'start_from_the_beginning_if_nothing_to_show')
+DATES: Tuple[str, ...] = ('check_in', 'check_out', 'date_buffer')
+# the module of the handlers, which are saved by their names (next_function and next step handlers)
+STEPS_MODULE = 'handlers.handlers_before_request.handlers'
+
+pending: Dict[int, Optional[str]] = dict()
+written: Dict[int, Optional[str]] = dict()
+pending_lock = threading.Lock()
+write_lock = threading.Lock()
+writer_lock = threading.Lock()
+wakeup = threading.Event()
+writer: Optional[threading.Thread] = None
+
+
+class SessionBackend(MemoryHandlerBackend):
+    """Storage of the next step handlers, which restores the saved session of the chat
+    before its first message is dispatched (so the restored next step handler receives it)"""
+
+    def get_handlers(self, handler_group_id):
+        UserData.get_user(handler_group_id)
+        return super().get_handlers(handler_group_id)
+
+
+backend = SessionBackend()
+
+
+class SessionTeleBot(ScheduledTeleBot):
+    """Telegram bot, whose searches survive the restart: the session of the chat
+    is checkpointed after each handled update and restored on the first update
+    of the chat after the restart"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, next_step_backend=backend, **kwargs)
+        UserData.session_loader = restore_session
+
+    def _exec_task(self, task, *args, **kwargs):
+        super()._exec_task(checkpointed, task, *args, **kwargs)
+
+
+def checkpointed(task: Callable, *args, **kwargs) -> None:
+    """Runs the handler of the update and checkpoints the session of its chat"""
+
+    try:
+        task(*args, **kwargs)
+    finally:
+        chat_id: Optional[int] = update_chat_id(args[0]) if args else None
+        if chat_id is not None:
+            checkpoint(chat_id)
+
+
+def update_chat_id(update: Any) -> Optional[int]:
+    """Returns the id of the chat of the message or of the pressed button (None for the other updates)"""
+
+    if isinstance(update, CallbackQuery):
+        update = update.message
+    return update.chat.id if isinstance(update, Message) else None
+
+
+def snapshot(user: UserData, next_steps: List[Handler]) -> Optional[Dict[str, Any]]:
+    """Returns the snapshot of the user's search or None, if there is no search in progress
+
+    :param: user: current user
+    :type: user: UserData
+    :param: next_steps: the pending next step handlers of the chat
+    :type: next_steps: list with Handler objects
+    :return: snapshot of the search
+    :rtype: dictionary"""
+
+    if getattr(user, 'current_command', None) is None:
+        return None
+    data: Dict[str, Any] = {
+        'fields': {name: getattr(user, name) for name in FIELDS if getattr(user, name, None) is not None},
+        'flags': [name for name in FLAGS if getattr(user, name, False)],
+        'dates': {name: getattr(user, name).isoformat() for name in DATES
+                  if getattr(user, name, None) is not None},
+        'next_steps': [handler.callback.__name__ for handler in next_steps]
+    }
+    if getattr(user, 'next_function', None) is not None:
+        data['next_function'] = user.next_function.__name__
+    buffer = getattr(user, 'current_buffer', None)
+    if isinstance(buffer, tuple):
+        data['cities'] = buffer
+    elif isinstance(buffer, OrderedDict):
+        data['hotels'] = [[getattr(hotel, slot) for slot in Hotel.__slots__] for hotel in list(buffer.values())]
+    return data
+
+
+def load(data: Dict[str, Any]) -> Tuple[UserData, List[Callable]]:
+    """Returns the user with the search of the snapshot and the next step handlers to register
+
+    :param: data: snapshot of the search
+    :type: data: dictionary
+    :return: user and next step handlers
+    :rtype: tuple with UserData and list of functions"""
+
+    steps = importlib.import_module(STEPS_MODULE)
+    user = UserData()
+    for name in FIELDS:
+        setattr(user, name, data['fields'].get(name))
+    for name in FLAGS:
+        setattr(user, name, name in data['flags'])
+    for name, value in data['dates'].items():
+        setattr(user, name, date.fromisoformat(value))
+    if 'next_function' in data:
+        user.next_function = getattr(steps, data['next_function'])
+    if 'cities' in data:
+        user.current_buffer = tuple(tuple(city) for city in data['cities'])
+    elif 'hotels' in data:
+        user.current_buffer = OrderedDict((row[0], Hotel(*row)) for row in data['hotels'])
+    return user, [getattr(steps, name) for name in data['next_steps']]
+
+
+def checkpoint(chat_id: int) -> None:
+    """Passes the snapshot of the chat's search to the writer thread, if it differs
+    from the one waiting to be written or, if there is none, from the written one
+    (the finished search is deleted)
+
+    :param: chat_id: id of the user's chat
+    :type: chat_id: integer
+    :return: None"""
+
+    user: Optional[UserData] = UserData.all_users.get(chat_id)
+    if user is None:
+        return
+    data: Optional[Dict[str, Any]] = snapshot(user, backend.handlers.get(chat_id) or [])
+    serialized: Optional[str] = json.dumps(data, ensure_ascii=False, separators=(',', ':')) if data else None
+    with pending_lock:
+        last: Optional[str] = pending[chat_id] if chat_id in pending else written.get(chat_id)
+        if last == serialized:
+            return
+        pending[chat_id] = serialized
+    start_writer()
+    wakeup.set()
+
+
+def restore_session(chat_id: int) -> Optional[UserData]:
+    """Returns the user with the saved search of the chat (the next step handlers
+    are registered again) or None, if there is no search, which has been checkpointed
+    during the last SESSION_TTL_HOURS
+
+    :param: chat_id: id of the user's chat
+    :type: chat_id: integer
+    :return: user with the restored search
+    :rtype: UserData"""
+
+    expired: datetime = datetime.now() - timedelta(hours=config.SESSION_TTL_HOURS)
+    with db:
+        serialized: Optional[str] = (Session.select(Session.data)
+                                     .where((Session.chat_id == str(chat_id)) & (Session.updated > expired))
+                                     .scalar())
+    if serialized is None:
+        return None
+    try:
+        user, next_steps = load(json.loads(serialized))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.exception(f'ups... the session of the chat {chat_id} is not restored')
+        return None
+    for step in next_steps:
+        backend.register_handler(chat_id, Handler(step))
+    with pending_lock:
+        written.setdefault(chat_id, serialized)
+    metrics.increment('sessions_restored')
+    logger.info(f'the search of the chat {chat_id} is restored ({user.current_command})')
+    return user
+
+
+def start_writer() -> None:
+    """Starts the writer thread, if it is not running yet"""
+
+    global writer
+    if writer is not None:
+        return
+    with writer_lock:
+        if writer is None:
+            writer = threading.Thread(target=write_sessions, name='sessions', daemon=True)
+            writer.start()
+
+
+def write_sessions() -> None:
+    """Loop of the writer thread: waits for the checkpoints and writes them"""
+
+    while True:
+        wakeup.wait()
+        wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('ups... the sessions are not saved')
+
+
+def flush() -> None:
+    """Writes the pending checkpoints (the latest snapshot of each chat) in one transaction.
+    The snapshots are remembered as written only after the transaction succeeds (the deleted
+    searches are forgotten). If it fails, they are put back to the pending ones (unless there
+    are newer ones) and are written with the next batch
+
+    :return: None"""
+
+    with write_lock:
+        with pending_lock:
+            batch: Dict[int, Optional[str]] = dict(pending)
+            pending.clear()
+        if not batch:
+            return
+        now: datetime = datetime.now()
+        rows = [{'chat_id': str(chat_id), 'data': serialized, 'updated': now}
+                for chat_id, serialized in batch.items() if serialized is not None]
+        finished = [str(chat_id) for chat_id, serialized in batch.items() if serialized is None]
+        try:
+            with db:
+                if rows:
+                    Session.insert_many(rows).on_conflict(
+                        conflict_target=[Session.chat_id],
+                        preserve=[Session.data, Session.updated]
+                    ).execute()
+                if finished:
+                    Session.delete().where(Session.chat_id.in_(finished)).execute()
+        except Exception:
+            with pending_lock:
+                for chat_id, serialized in batch.items():
+                    pending.setdefault(chat_id, serialized)
+            raise
+        with pending_lock:
+            for chat_id, serialized in batch.items():
+                if serialized is None:
+                    written.pop(chat_id, None)
+                else:
+                    written[chat_id] = serialized
+        metrics.increment('sessions_checkpointed', len(rows))
+
+
+atexit.register(flush)
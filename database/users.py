@@ -0,0 +1,45 @@
+"""Registry of the bot users.
+
+The ids of the user rows are kept in memory by the chat ids, so the users,
+who have already been registered, cost no queries to the database. The registry
+is loaded when the bot is started, a new user is registered by a single
+INSERT ... ON CONFLICT DO NOTHING (the other bot process may have registered
+him already) and one SELECT of his id"""
+
+from typing import Dict
+
+from logger.logger import logger_wraps, logger
+from models.database import db, User
+
+known_users: Dict[int, int] = dict()
+
+
+@logger_wraps()
+def load_users() -> None:
+    """Loads the ids of all the registered users into memory
+    (called once when the bot is started)
+
+    :return: None"""
+
+    with db:
+        known_users.update((int(chat_id), user_id)
+                           for chat_id, user_id in User.select(User.chat_id, User.id).tuples())
+    logger.info(f'{len(known_users)} users are loaded')
+
+
+def register(chat_id: int) -> int:
+    """Returns the id of the user's row, the user is added to the database
+    if he is not registered yet
+
+    :param: chat_id: id of the user's chat
+    :type: chat_id: integer
+    :return: id of the user's row
+    :rtype: integer"""
+
+    user_id = known_users.get(chat_id)
+    if user_id is None:
+        with db:
+            User.insert(chat_id=chat_id).on_conflict_ignore().execute()
+            user_id = User.select(User.id).where(User.chat_id == chat_id).scalar()
+        known_users[chat_id] = user_id
+    return user_id
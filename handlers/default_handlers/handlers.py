@@ -1,15 +1,41 @@
+from typing import Callable, Dict
+
 from telebot.apihelper import ApiTelegramException
-from telebot.types import Message, CallbackQuery
+from telebot.types import Message, CallbackQuery, InlineQuery
 
 import database.database_methods as database
 import handlers.handlers_before_request.handlers as handlers
+from keyboards import callback_data as protocol
 from keyboards.reply.menu_button import menu_button
 from loader import my_bot
 from logger.logger import logger_wraps, logger
 from models.calendar import DetailedTelegramCalendar, MyTranslationCalendar
 from models.data_class import UserData
+from utils import metrics
 from utils.answers.answers_for_states import answers
 from utils.answers.callbacks import callbacks
+from utils.answers.inline_queries import inline_queries
+
+# handlers of the pressed buttons by the codes of their actions (see keyboards.callback_data),
+# the texts are displayed instead of the keyboard
+CALLBACK_ROUTES: Dict[str, Callable[[CallbackQuery, str], None]] = {
+    protocol.BEST_DEAL: lambda call, argument: callbacks.best_deal(message=call.message, callback_id=call.id),
+    protocol.LOW_PRICE: lambda call, argument: callbacks.low_price(message=call.message, callback_id=call.id),
+    protocol.HIGH_PRICE: lambda call, argument: callbacks.high_price(message=call.message, callback_id=call.id),
+    protocol.HISTORY: lambda call, argument: callbacks.history(message=call.message, callback_id=call.id),
+    protocol.YES: lambda call, argument: callbacks.yes_button(message=call.message, callback_id=call.id,
+                                                               callback_data='ДА'),
+    protocol.NO: lambda call, argument: callbacks.no_button(message=call.message, callback_id=call.id,
+                                                             callback_data='НЕТ'),
+    protocol.MORE_HOTELS: lambda call, argument: callbacks.new_hotels(message=call.message, callback_id=call.id,
+                                                                       callback_data='Загрузить еще отели'),
+    protocol.NEW_SEARCH: lambda call, argument: callbacks.new_search(message=call.message, callback_id=call.id,
+                                                                      callback_data='Новый поиск'),
+    protocol.END_SEARCH: lambda call, argument: callbacks.end_search(message=call.message, callback_id=call.id,
+                                                                      callback_data='Закончить поиск'),
+    protocol.CITY: lambda call, argument: callbacks.show_hotels(message=call.message, callback_id=call.id,
+                                                                 callback_data=argument)
+}
 
 
 @logger_wraps()
@@ -76,7 +102,8 @@ def say_hello_world(message: Message) -> None:
 @my_bot.message_handler(commands=['lowprice'])
 def command_low_price(message: Message):
     """Displays a list of the cheapest hotels. The previous inline keyboard is
-    removed (if available), all dynamic attributes of the user data-class object are updated.
+    removed (if available), all dynamic attributes of the user data-class object are updated
+    (and the counters of the chat are reset, so the calls are counted per search).
     The current value of the entered command is set in a special attribute
     of the user data-class
 
@@ -88,6 +115,7 @@ def command_low_price(message: Message):
 
     handlers.delete_previous_message(message)
     current_user.clear_all()
+    metrics.pop_chat(message.chat.id)
     current_user.current_command = '/lowprice'
     my_bot.send_message(chat_id=message.chat.id,
                         text='*Что ж, поищем отели подешевле)*',
@@ -99,7 +127,8 @@ def command_low_price(message: Message):
 @my_bot.message_handler(commands=['highprice'])
 def command_high_price(message: Message):
     """Displays a list of the most expensive hotels. The previous inline keyboard
-     is removed (if available), all dynamic attributes of the user data-class object are updated.
+     is removed (if available), all dynamic attributes of the user data-class object are updated
+    (and the counters of the chat are reset, so the calls are counted per search).
     The current value of the entered command is set in a special attribute
     of the user data-class
 
@@ -110,6 +139,7 @@ def command_high_price(message: Message):
     current_user = UserData.get_user(message.chat.id)
     handlers.delete_previous_message(message)
     current_user.clear_all()
+    metrics.pop_chat(message.chat.id)
     current_user.current_command = '/highprice'
     my_bot.send_message(chat_id=message.chat.id,
                         text='*Что ж, поищем отели подороже)*',
@@ -122,7 +152,8 @@ def command_high_price(message: Message):
 def command_best_deal(message: Message):
     """Displays a list of the most suitable hotels by price and distance
      from the city center. The previous inline keyboard
-     is removed (if available), all dynamic attributes of the user data-class object are updated.
+     is removed (if available), all dynamic attributes of the user data-class object are updated
+    (and the counters of the chat are reset, so the calls are counted per search).
     The current value of the entered command is set in a special attribute
     of the user data-class
 
@@ -133,6 +164,7 @@ def command_best_deal(message: Message):
     current_user = UserData.get_user(message.chat.id)
     handlers.delete_previous_message(message)
     current_user.clear_all()
+    metrics.pop_chat(message.chat.id)
     current_user.current_command = '/bestdeal'
     my_bot.send_message(chat_id=message.chat.id,
                         text='*Что ж, поищем самые лучшие отели)*',
@@ -145,13 +177,24 @@ def command_best_deal(message: Message):
 def command_history(message: Message):
     """Displays a list of all commands entered, the date and time of introduction,
     as well as their results. The previous inline keyboard
-    is removed (if available).
+    is removed (if available). "/history export [csv|json]" sends
+    the whole history as a single document instead.
 
     # :param message: current message
     # :type message: Message object
     :return: None"""
 
     handlers.delete_previous_message(message)
+    arguments = message.text.split() if message.text else []
+    if arguments[:2] == ['/history', 'export']:
+        file_format = arguments[2].lower() if len(arguments) > 2 else 'csv'
+        if file_format not in database.EXPORT_FORMATS:
+            my_bot.send_message(chat_id=message.chat.id,
+                                text='*Доступные форматы: csv, json*',
+                                parse_mode='Markdown')
+            return
+        database.export_history(message, file_format=file_format)
+        return
     my_bot.send_message(chat_id=message.chat.id,
                         text='*Что ж, просмотрим историю)*',
                         parse_mode='Markdown')
@@ -200,7 +243,7 @@ def first_query_handler(call: CallbackQuery) -> None:
                 chat_id=call.message.chat.id,
                 message_id=call.message.message_id,
                 reply_markup=key
-            )
+            ).result()
         elif result:
             logger.info(f'{current_user.user_name} entered {result}')
             current_user = UserData.get_user(call.message.chat.id)
@@ -208,7 +251,7 @@ def first_query_handler(call: CallbackQuery) -> None:
             my_bot.edit_message_text(f"*Вы ввели {result.strftime('%d.%m.%Y')}*",
                                      chat_id=call.message.chat.id,
                                      message_id=call.message.message_id,
-                                     parse_mode='Markdown')
+                                     parse_mode='Markdown').result()
             if current_user.date_flag is False:
                 handlers.check_in(call.message)
             else:
@@ -228,29 +271,21 @@ def second_query_handler(call: CallbackQuery) -> None:
     :type call: CallbackQuery object
     :return: None"""
 
-    if call.data == '/bestdeal':
-        callbacks.best_deal(message=call.message, callback_id=call.id)
-    elif call.data == '/lowprice':
-        callbacks.low_price(message=call.message, callback_id=call.id)
-    elif call.data == '/highprice':
-        callbacks.high_price(message=call.message, callback_id=call.id)
-    elif call.data == '/history':
-        callbacks.history(message=call.message, callback_id=call.id)
-    elif call.data == 'ДА':
-        callbacks.yes_button(message=call.message, callback_id=call.id,
-                             callback_data=call.data)
-    elif call.data == 'НЕТ':
-        callbacks.no_button(message=call.message, callback_id=call.id,
-                            callback_data=call.data)
-    elif call.data == 'Загрузить еще отели':
-        callbacks.new_hotels(message=call.message, callback_id=call.id,
-                             callback_data=call.data)
-    elif call.data == 'Новый поиск':
-        callbacks.new_search(message=call.message, callback_id=call.id,
-                             callback_data=call.data)
-    elif call.data == 'Закончить поиск':
-        callbacks.end_search(message=call.message, callback_id=call.id,
-                             callback_data=call.data)
-    else:
-        callbacks.show_hotels(message=call.message, callback_id=call.id,
-                              callback_data=call.data)
+    route = protocol.decode(call.data)
+    if route is None or route[0] not in CALLBACK_ROUTES:
+        my_bot.answer_callback_query(callback_query_id=call.id, text='Эта кнопка устарела')
+        return
+    code, argument = route
+    CALLBACK_ROUTES[code](call, argument)
+
+
+@logger_wraps()
+@my_bot.inline_handler(func=lambda query: True)
+def inline_query_handler(query: InlineQuery) -> None:
+    """Suggests the cities while the user is typing the inline query (@bot city)
+
+    :param query: current inline query
+    :type query: InlineQuery object
+    :return: None"""
+
+    inline_queries.answer_query(query)
@@ -1,16 +1,18 @@
 from datetime import date
 
-import emoji
 from telebot.apihelper import ApiTelegramException
 from telebot.types import Message
 
 import database.database_methods as database
 import handlers.default_handlers.handlers as commands
 import keyboards.inline.inline_keyboards as inline
-from handlers.handlers_for_request_and_after.rapidapi import request_to_api, result_displaying
+from handlers.handlers_for_request_and_after.prefetch import speculate_properties
+from handlers.handlers_for_request_and_after.rapidapi import request_to_api
+from keyboards.factory import MENU_TEXT
 from loader import my_bot
 from logger.logger import logger_wraps, logger
 from models.data_class import UserData
+from utils import progress
 
 
 @logger_wraps()
@@ -343,7 +345,7 @@ def check_in(message: Message) -> None:
     message (the date of check-in at the hotel) and offers to re-enter,
     if it is specified incorrectly. If the correct message is entered,
     the question is asked about the date on which the accommodation is planned
-    in the hotel. The date_flag attribute of the user data class object determines the priority
+    in the hotel (meanwhile the hotels list is requested speculatively). The date_flag attribute of the user data class object determines the priority
     of calling the check_in and check_out functions. The entered date is taken
     from a special buffer attribute
 
@@ -355,6 +357,7 @@ def check_in(message: Message) -> None:
 
     if not str(current_user.date_buffer - date.today()).startswith('-'):
         current_user.check_in = current_user.date_buffer
+        speculate_properties(message)
         my_bot.send_message(chat_id=message.chat.id,
                             text='*Выберите дату, до которой планируете *'
                                  '*проживать в отеле*',
@@ -426,7 +429,7 @@ def check_message(message: Message) -> None:
         commands.command_high_price(message)
     elif message.text == '/bestdeal':
         commands.command_best_deal(message)
-    elif message.text == '/history':
+    elif (message.text or '').split()[:1] == ['/history']:
         commands.command_history(message)
     elif message.text == '/hello-world':
         commands.say_hello_world(message)
@@ -437,7 +440,7 @@ def check_message(message: Message) -> None:
     elif message.text == '/help':
         commands.help_me(message)
         my_bot.register_next_step_handler(message, check_message)
-    elif message.text == emoji.emojize('Меню   :desert_island:'):
+    elif message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     elif message.text == '/start':
         commands.send_basic_greeting(message)
@@ -531,7 +534,8 @@ def photo_count(message: Message) -> None:
 @logger_wraps()
 def delete_previous_message(message: Message) -> None:
     """Removes the previous built-in buttons or messages if it is possible
-    and necessary
+    and necessary (the message with the displayed hotels is kept, only its buttons are replaced
+    with the kept ones)
 
     :param message: current message
     :type message: Message object
@@ -540,12 +544,43 @@ def delete_previous_message(message: Message) -> None:
     current_user = UserData.get_user(message.chat.id)
     try:
         if current_user.delete_message is True:
-            my_bot.delete_message(chat_id=message.chat.id,
-                                  message_id=current_user.id_message_for_delete)
             current_user.delete_message = False
+            if current_user.kept_keyboard is not None:
+                my_bot.edit_message_reply_markup(chat_id=message.chat.id,
+                                                 message_id=current_user.id_message_for_delete,
+                                                 reply_markup=current_user.kept_keyboard).result()
+            else:
+                my_bot.delete_message(chat_id=message.chat.id,
+                                      message_id=current_user.id_message_for_delete).result()
     # in case of pressing the menu button too fast repeatedly an exception occurs
     except ApiTelegramException:
         logger.exception('ups... nothing to delete')
+    current_user.kept_keyboard = None
+
+
+@logger_wraps()
+def replace_previous_message(message: Message, text: str) -> None:
+    """Replaces the previous built-in buttons with the given text: the message with the inline keyboard
+    is edited in place instead of sending the text and deleting the keyboard. If there is no such
+    message (or it has to be kept), the text is sent and the buttons are removed as usual
+
+    :param message: current message
+    :type message: Message object
+    :param: text: the text which replaces the buttons
+    :type: text: string
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if current_user.delete_message is True and current_user.kept_keyboard is None:
+        try:
+            my_bot.edit_message_text(text, chat_id=message.chat.id,
+                                     message_id=current_user.id_message_for_delete).result()
+            current_user.delete_message = False
+            return
+        except ApiTelegramException:
+            logger.exception('ups... nothing to replace')
+    my_bot.send_message(chat_id=message.chat.id, text=text)
+    delete_previous_message(message)
 
 
 @logger_wraps()
@@ -579,10 +614,10 @@ def check_condition_for_two_commands(message: Message) -> None:
 @logger_wraps()
 def result_waiting(message: Message):
     """Calls a function that accesses the API to get the required number of hotels.
-    Displays a waiting message and gif-image, and after receiving
-    a response from the API-function, deletes them (The gif-message id
-    is recorded to the special field of user data class, for subsequent
-    forced deletion, if something went wrong)
+    Displays the progress message with the current stage of the request, which is edited
+    in place and becomes the message with the result (the found cities, the question about
+    photos or the page of hotels). If the result is sent separately, the progress message
+    is deleted (also if something went wrong)
 
     :param message: current message
     :type message: Message object
@@ -591,24 +626,19 @@ def result_waiting(message: Message):
     current_user = UserData.get_user(message.chat.id)
 
     try:
-        first_result = my_bot.send_message(chat_id=message.chat.id,
-                                           text='*Выполняю поиск. Подождите немного*',
-                                           parse_mode='Markdown')
-
-        second_result = my_bot.send_video(message.chat.id,
-                                          'https://i.gifer.com/FWcb.gif', None, 'Text')
-        current_user.id_message_for_delete = second_result.message_id
-        current_user.delete_message = True
+        if current_user.zero_condition:
+            progress.start(message, '*Ищу город. Подождите немного*')
+        elif current_user.third_condition:
+            progress.start(message, '*Получаю список отелей. Подождите немного*')
+        else:
+            progress.start(message, f'*Загружаю отели 0/{current_user.hotels_count}*')
 
         if request_to_api(message):
             if current_user.intermediate_condition:
                 inline.yes_no_keyboard(message)
             elif current_user.continue_searching:
                 current_user.continue_searching = False
-                result_displaying(message)
-            my_bot.delete_message(chat_id=message.chat.id,
-                                  message_id=second_result.message_id)
-            my_bot.delete_message(chat_id=message.chat.id,
-                                  message_id=first_result.message_id)
     except (ApiTelegramException, RuntimeError):
         logger.exception('ups... something went wrong')
+    finally:
+        progress.close(message)
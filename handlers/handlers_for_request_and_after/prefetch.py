@@ -0,0 +1,150 @@
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, OrderedDict, Tuple
+
+import requests
+from requests.models import Response
+from telebot.types import Message
+
+import config
+import handlers.handlers_for_request_and_after.rapidapi as rapidapi
+from logger.logger import logger_wraps, logger
+from models.data_class import UserData
+from models.hotel import Hotel
+from utils import quota
+
+prefetch_executor = ThreadPoolExecutor(max_workers=config.PREFETCH_WORKERS,
+                                       thread_name_prefix='prefetch')
+
+
+@logger_wraps()
+def prefetch_next_page(message: Message) -> None:
+    """Starts requesting the summaries of the next page hotels in the background, while the user
+    is viewing the current page. The requests are made in a separate small thread pool
+    and only within the budget of the current search (PREFETCH_BUDGET) and while the reserve
+    of the RapidAPI request budget is not reached
+
+    :param message: current message
+    :type message: Message object
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    hotels: OrderedDict[str, Hotel] = current_user.current_buffer
+    count: int = current_user.hotels_count
+    if current_user.prefetched_summaries is None:
+        current_user.prefetched_summaries = dict()
+    prefetched: Dict[str, Future] = current_user.prefetched_summaries
+
+    next_page: List[Hotel] = list(hotels.values())[count: count * 2]
+    for hotel in next_page:
+        if hotel.hotel_id in prefetched:
+            continue
+        if current_user.prefetch_spent >= config.PREFETCH_BUDGET:
+            logger.info(f'{current_user.user_name} has spent the prefetch budget')
+            break
+        if not quota.available(background=True):
+            logger.info('the prefetch is skipped, only the reserve of the request budget is left')
+            break
+        current_user.prefetch_spent += 1
+        prefetched[hotel.hotel_id] = prefetch_executor.submit(
+            rapidapi.fetch_hotel_summary, message, hotel, background=True)
+
+
+def take_prefetched(message: Message, hotel: Hotel) -> Optional[Future]:
+    """Returns the prefetched request of the hotel summary (if there is one and it has not failed)
+    and removes it from the prefetched requests of the user
+
+    :param message: current message
+    :type message: Message object
+    :param: hotel: record of the hotel
+    :type: hotel: Hotel
+    :return: the prefetched request or None
+    :rtype: Future"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if not current_user.prefetched_summaries:
+        return None
+    future: Optional[Future] = current_user.prefetched_summaries.pop(hotel.hotel_id, None)
+    if future is not None and (future.cancelled() or (future.done() and future.exception() is not None)):
+        return None
+    return future
+
+
+@logger_wraps()
+def cancel_prefetch(message: Message) -> None:
+    """Cancels the prefetched and speculative requests which have not been started yet
+    and forgets the rest of them (necessary when the user starts a new search or ends it)
+
+    :param message: current message
+    :type message: Message object
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    current_user.cancel_prefetched_requests()
+
+
+def search_parameters(user: UserData) -> Tuple:
+    """Returns the parameters on which the response of the hotels list depends
+
+    :param: user: current user
+    :type: user: UserData
+    :return: destination id, number of adults, check-in and check-out dates
+    :rtype: Tuple"""
+
+    return user.destination_id, user.adults_count, user.check_in, user.check_out
+
+
+@logger_wraps()
+def speculate_properties(message: Message) -> None:
+    """Starts the provisional request of the hotels list as soon as the check-in date is selected
+    (the destination and the number of adults are already known). The check-out date is assumed
+    to be SPECULATIVE_NIGHTS after the check-in date. The response is reused if the user selects
+    exactly this date, otherwise it is discarded
+
+    :param message: current message
+    :type message: Message object
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if config.SPECULATIVE_NIGHTS <= 0 or not quota.available(background=True):
+        return
+    if current_user.speculative_properties is not None:
+        current_user.speculative_properties[1].cancel()
+
+    check_out = current_user.check_in + timedelta(days=config.SPECULATIVE_NIGHTS)
+    parameters = (current_user.destination_id, current_user.adults_count,
+                  current_user.check_in, check_out)
+    current_user.speculative_properties = parameters, prefetch_executor.submit(
+        rapidapi.fetch_properties, message, check_out)
+
+
+@logger_wraps()
+def take_speculative_properties(message: Message) -> Optional[Response]:
+    """Returns the response of the provisional hotels list request, if it was made
+    with the final search parameters and was successful. Otherwise it is discarded
+
+    :param message: current message
+    :type message: Message object
+    :return: response from the API endpoint or None
+    :rtype: Response object"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if current_user.speculative_properties is None:
+        return None
+    parameters, future = current_user.speculative_properties
+    current_user.speculative_properties = None
+
+    if parameters != search_parameters(current_user):
+        future.cancel()
+        logger.info(f'{current_user.user_name} has selected other dates, '
+                    f'the speculative hotels list is discarded')
+        return None
+    try:
+        response: Response = future.result()
+    except (requests.exceptions.RequestException, CancelledError):
+        logger.exception('ups... the speculative hotels list is not received')
+        return None
+    if response.status_code != requests.codes.ok:
+        return None
+    logger.info(f'{current_user.user_name} gets the speculative hotels list')
+    return response
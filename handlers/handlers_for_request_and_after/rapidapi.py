@@ -1,8 +1,8 @@
 import datetime
 from collections import OrderedDict
-from typing import Dict, List, Tuple, Union, Callable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple, Union, Callable
 
-import emoji
 import requests
 from requests.models import Response
 from telebot.apihelper import ApiTelegramException
@@ -10,11 +10,25 @@ from telebot.types import Message, InputMediaPhoto
 
 import config
 import database.database_methods as database
+from database import destinations, history
 import handlers.handlers_before_request.handlers as handlers
+import handlers.handlers_for_request_and_after.prefetch as prefetch
 import keyboards.inline.inline_keyboards as inline
 from loader import my_bot
 from logger.logger import logger_wraps, logger
 from models.data_class import UserData
+from models.hotel import Hotel
+from utils import metrics, progress, quota, retry, templates
+from utils.parsing import decode, parse_properties, parse_summary
+from utils.rate_limiter import QueuedCall
+from utils.streaming import ReorderBuffer
+
+summaries_executor = ThreadPoolExecutor(max_workers=config.SUMMARY_WORKERS,
+                                        thread_name_prefix='summary')
+# the descriptions of the errors, with which Telegram rejects the saved file ids
+FILE_ID_ERRORS: Tuple[str, ...] = ('wrong file identifier', 'wrong remote file identifier',
+                                   'wrong file_id or the file is temporarily unavailable',
+                                   'file_reference_expired')
 
 
 @logger_wraps()
@@ -29,9 +43,20 @@ Dict[str, str], str]:
     :rtype: Tuple[Dict[str, str], Dict[str, str], str]"""
 
     current_user = UserData.get_user(message.chat.id)
+    return locations_request(current_user.city)
+
+
+def locations_request(city: str) -> Tuple[Dict[str, str], Dict[str, str], str]:
+    """Returns the endpoint url, querystring and headers for getting possible locations of the city
+
+    :param: city: name of the city
+    :type: city: string
+    :return: headers, querystring, url
+    :rtype: Tuple[Dict[str, str], Dict[str, str], str]"""
+
     url = "https://hotels4.p.rapidapi.com/locations/v3/search"
     querystring = {
-        "q": f"{current_user.city}", "locale": "ru_RU"
+        "q": f"{city}", "locale": "ru_RU"
     }
 
     headers = {
@@ -43,19 +68,23 @@ Dict[str, str], str]:
 
 
 @logger_wraps()
-def properties(message: Message) -> Tuple[Dict[str, str], Dict[str,
+def properties(message: Message, check_out: Optional[datetime.date] = None) -> Tuple[Dict[str, str], Dict[str,
 Union[str, int, datetime.date]], str]:
     """Gets the endpoint url, payload and headers for getting main properties of the selected hotel
     and returns them
 
     :param: message: current message
     :type: message: Message object
+    :param: check_out: check-out date (by default the check_out attribute of the user data class)
+    :type: check_out: date object
     :return: headers, payload, url
     :rtype: Tuple[Dict[str, str], Dict[str, Union[str, int, datetime.date]], str]"""
 
     current_user = UserData.get_user(message.chat.id)
+    if check_out is None:
+        check_out = current_user.check_out
     in_day, in_month, in_year = map(int, current_user.check_in.strftime('%y-%m-%d').split('-'))
-    out_day, out_month, out_year = map(int, current_user.check_out.strftime('%y-%m-%d').split('-'))
+    out_day, out_month, out_year = map(int, check_out.strftime('%y-%m-%d').split('-'))
     command: str = current_user.current_command
     url = "https://hotels4.p.rapidapi.com/properties/v2/list"
 
@@ -94,13 +123,15 @@ Union[str, int, datetime.date]], str]:
 
 
 @logger_wraps()
-def detailed_description(message: Message) -> Tuple[Dict[str, str],
+def detailed_description(message: Message, hotel_id: Optional[str] = None) -> Tuple[Dict[str, str],
 Dict[str, Union[str, int]], str]:
     """Gets the endpoint url, payload and headers for getting detailed desctiption
     of the selected hotel and returns them
 
     :param: message: current message
     :type: message: Message object
+    :param: hotel_id: id of the hotel (by default the hotel_id attribute of the user data class)
+    :type: hotel_id: string
     :return: headers, querystring, url
     :rtype: Tuple[Dict[str, str], Dict[str, Union[str, int]], str]"""
 
@@ -112,7 +143,7 @@ Dict[str, Union[str, int]], str]:
         "currency": "USD",
         "eapid": 1,
         "locale": "ru_RU",
-        "propertyId": current_user.hotel_id
+        "propertyId": hotel_id if hotel_id is not None else current_user.hotel_id
     }
     headers = {
         "content-type": "application/json",
@@ -146,7 +177,7 @@ def function_selection(message: Message) -> Callable:
 @logger_wraps()
 def request_helper(message: Message) -> requests.Response:
     """Depending on the current state of the bot, gets headers, querustring/payload, url and sends
-     a request to the corresponding API endpoint
+     a request to the corresponding API endpoint (with retries)
 
     :param: message: current message
     :type: message: Message object
@@ -156,68 +187,59 @@ def request_helper(message: Message) -> requests.Response:
     current_user = UserData.get_user(message.chat.id)
     if current_user.zero_condition:
         headers, querystring, url = function_selection(message)
-        response = requests.get(url, headers=headers,
-                                params=querystring, timeout=10)
+        response = retry.request('locations', 'GET', url, chat_id=message.chat.id,
+                                 headers=headers, params=querystring)
 
         return response
     elif current_user.third_condition:
         headers, payload, url = function_selection(message)
-        response = requests.post(url, json=payload, headers=headers)
+        response = retry.request('properties', 'POST', url, chat_id=message.chat.id,
+                                 json=payload, headers=headers)
 
         return response
     elif current_user.fourth_condition:
         headers, payload, url = function_selection(message)
-        response = requests.post(url, json=payload, headers=headers)
+        response = retry.request('summary', 'POST', url, chat_id=message.chat.id,
+                                 json=payload, headers=headers)
 
         return response
 
 
 @logger_wraps()
-def create_request(message: Message) -> requests.Response:
-    """Executes a request to the corresponding API endpoint using an auxiliary function.
-    If something went wrong, repeats the request the specified number of times
+def create_request(message: Message) -> Optional[requests.Response]:
+    """Executes a request to the corresponding API endpoint using an auxiliary function
+    (the failed request is repeated by the retry layer). If the response is not received,
+    informs the user about an unsuccessful attempt to obtain data
 
     :param: message: current message
     :type: message: Message object
-    :return: response from  the corresponding API endpoint or informs the user about an unsuccessful
-    attempt to obtain data
+    :return: response from  the corresponding API endpoint or None
     :rtype: Response object"""
 
-    current_user = UserData.get_user(message.chat.id)
-
     try:
-        current_user.connect_attempt += 1
         response: Response = request_helper(message)
         if response.status_code == requests.codes.ok:
 
             return response
 
-        else:
-            my_bot.send_message(chat_id=message.chat.id,
-                                text='*Упс, кажется что-то пошло не так.*'
-                                     '* Сейчас попробую еще раз*',
-                                parse_mode='Markdown')
-            if current_user.connect_attempt < 3:
-                request_to_api(message)
-            else:
-                my_bot.send_message(chat_id=message.chat.id,
-                                    text='*Сейчас я не могу помочь вам.*'
-                                         '* Попробуйте еще раз немного позже*',
-                                    parse_mode='Markdown')
-                handlers.delete_previous_message(message)
-    except requests.exceptions.Timeout:
-        my_bot.send_message(chat_id=message.chat.id,
-                            text='*Кажется появились какие-то проблемы*'
-                                 '* с соединением. Сейчас попробую еще раз*',
-                            parse_mode='Markdown')
-        request_to_api(message)
+        logger.warning(f'request has failed (status code {response.status_code})')
+    except requests.exceptions.RequestException:
+        logger.exception('ups... something went wrong')
+
+    my_bot.send_message(chat_id=message.chat.id,
+                        text='*Сейчас я не могу помочь вам.*'
+                             '* Попробуйте еще раз немного позже*',
+                        parse_mode='Markdown')
+    handlers.delete_previous_message(message)
 
 
 @logger_wraps()
 def request_to_api(message: Message) -> bool:
     """Depending on the current state of the bot, it calls the corresponding functions
     for processing incoming data. At the same time, if necessary, executes a request
-    to the corresponding API endpoint using an auxiliary function
+    to the corresponding API endpoint using an auxiliary function (the cities are looked up
+    in the destination index first, the hotels list received by the speculative request
+    is reused, if it matches the search parameters)
 
     :param: message: current message
     :type: message: Message object
@@ -227,8 +249,17 @@ def request_to_api(message: Message) -> bool:
     try:
         if current_user.fourth_condition:
             gets_detailed_hotels_data(message=message)
+        elif current_user.zero_condition and (cities := destinations.lookup(current_user.city)):
+            current_user.current_buffer = tuple(cities)
+            inline.cities_keyboard(message)
         else:
-            response: Response = create_request(message)
+            response: Optional[Response] = None
+            if current_user.third_condition:
+                response = prefetch.take_speculative_properties(message)
+            if response is None:
+                response = create_request(message)
+            if response is None:
+                return True
 
             if current_user.zero_condition:
                 gets_possible_hotels(response=response, user=current_user, message=message)
@@ -244,7 +275,8 @@ def request_to_api(message: Message) -> bool:
 @logger_wraps()
 def processing_cities(message: Message) -> None:
     """Extracts the raw data from the corresponding attribute of the user data class,
-    generates a list with hotel locations and re-assigns it to the same attribute.
+    generates a tuple with the names and the ids of hotel locations (the locations without
+    the name or the id are skipped) and re-assigns it to the same attribute.
 
     :param: message: current message
     :type: message: Message object
@@ -253,11 +285,9 @@ def processing_cities(message: Message) -> None:
     current_user = UserData.get_user(message.chat.id)
     all_cities: List[Union[Dict]] = current_user.current_buffer
     current_user.current_buffer = None
-    processed_cities = list()
-    for i_element in all_cities:
-        if "regionNames" in i_element and "essId" in i_element:
-            processed_cities.append({i_element.get("regionNames").get(
-                "fullName"): i_element.get("essId").get("sourceId")})
+    pairs = ((i_element.get("regionNames", {}).get("fullName"), i_element.get("essId", {}).get("sourceId"))
+             for i_element in all_cities)
+    processed_cities = tuple(pair for pair in pairs if None not in pair)
     current_user.current_buffer = processed_cities
     inline.cities_keyboard(message)
 
@@ -265,7 +295,8 @@ def processing_cities(message: Message) -> None:
 @logger_wraps()
 def gets_possible_hotels(response: Response, user: UserData, message: Message) -> None:
     """Assigns the raw data of possible hotel locations to the corresponding attribute of the user
-    data class or informs that nothing have been found for the specified parameters
+    data class (the locations are added to the destination index) or informs that nothing
+    have been found for the specified parameters
 
     :param: message: current message
     :type: message: Message object
@@ -275,22 +306,23 @@ def gets_possible_hotels(response: Response, user: UserData, message: Message) -
     :type: user: UserData
     :return: None"""
 
-    suggestions: List[Union[Dict]] = response.json().get("sr")
+    suggestions: List[Union[Dict]] = decode(response.content).get("sr", [])
     if len(suggestions) != 0:
+        destinations.save_destinations(suggestions)
         user.current_buffer: List[Union[Dict]] = suggestions
         processing_cities(message)
     else:
-        result = my_bot.send_message(chat_id=message.chat.id,
-                                     text='*По вашему запросу ничего не найдено.*'
-                                          '* Попробуйте выбрать другие варианты*',
-                                     parse_mode='Markdown')
+        result = progress.deliver(message,
+                                  text='*По вашему запросу ничего не найдено.*'
+                                       '* Попробуйте выбрать другие варианты*')
         my_bot.register_next_step_handler(result, handlers.determination_city)
 
 
 @logger_wraps()
 def gets_main_hotels_data(response: Response, user: UserData, message: Message) -> None:
-    """Gets main information about each hotel from raw data and adds it to a special dynamic
-    attribute of the user data class. Changes the current state of the bot
+    """Parses the response into the hotel records (only the main information about each hotel
+    is kept) and adds them to a special dynamic attribute of the user data class.
+    Changes the current state of the bot
 
     :param: message: current message
     :type: message: Message object
@@ -300,48 +332,151 @@ def gets_main_hotels_data(response: Response, user: UserData, message: Message)
     :type: user: UserData
     :return: None"""
 
-    user.current_buffer = OrderedDict()
-    hotels_data: List[Dict] = response.json().get("data", "").get("propertySearch", "").get("properties")
-
-    for item in hotels_data:
-        hotel_id: str = item.get("id")
-        user.current_buffer[hotel_id] = {
-            "name": item.get("name", ""),
-            "price": item.get("price", "").get("lead", "").get("amount", ""),
-            "remoteness": item.get("destinationInfo", "").get("distanceFromDestination", "").get("value", 0)
-        }
+    user.current_buffer = parse_properties(response.content)
     check_entered_commands(message)
     user.third_condition = False
     user.intermediate_condition = True
 
 
+def fetch_locations(city: str, chat_id: int) -> List[Dict]:
+    """Requests the possible locations of the city outside of the search dialog
+    (e.g. for the inline query) and adds them to the destination index
+
+    :param: city: name of the city
+    :type: city: string
+    :param: chat_id: id of the user, who the request is made for
+    :type: chat_id: integer
+    :return: the raw suggestions of the locations endpoint (empty, if the request has failed)
+    :rtype: list with dictionaries"""
+
+    headers, querystring, url = locations_request(city)
+    try:
+        response: Response = retry.request('locations', 'GET', url, chat_id=chat_id,
+                                           headers=headers, params=querystring)
+    except requests.exceptions.RequestException:
+        logger.exception('ups... the locations are not received')
+        return []
+    if response.status_code != requests.codes.ok:
+        return []
+    suggestions: List[Dict] = decode(response.content).get("sr", [])
+    destinations.save_destinations(suggestions)
+    return suggestions
+
+
+@logger_wraps()
+def fetch_properties(message: Message, check_out: datetime.date) -> Response:
+    """Requests the hotels list with the given check-out date. It is executed in the worker thread,
+    so the attributes of the user data class are not changed. The request is made in the background
+    (only within the reserve of the request budget)
+
+    :param: message: current message
+    :type: message: Message object
+    :param: check_out: check-out date
+    :type: check_out: date object
+    :return: response from the API endpoint
+    :rtype: Response object"""
+
+    headers, payload, url = properties(message, check_out=check_out)
+    return retry.request('properties', 'POST', url, chat_id=message.chat.id, background=True,
+                         json=payload, headers=headers)
+
+
+@logger_wraps()
+def fetch_hotel_summary(message: Message, hotel: Hotel, background: bool = False) -> Hotel:
+    """Requests the summary of the hotel and adds the received information to its record.
+    It is executed in the worker thread, so the attributes of the user data class are not changed.
+    If the request fails (or its response is not parsed), the record remains with the main
+    information only. The background
+    request (prefetch), which is over the request budget, fails, so the summary is requested
+    again when the hotel is displayed
+
+    :param: message: current message
+    :type: message: Message object
+    :param: hotel: record of the hotel
+    :type: hotel: Hotel
+    :param: background: the request is not awaited by the user
+    :type: background: bool
+    :return: the same record of the hotel
+    :rtype: Hotel"""
+
+    headers, payload, url = detailed_description(message, hotel_id=hotel.hotel_id)
+    try:
+        response: Response = retry.request('summary', 'POST', url, chat_id=message.chat.id,
+                                           background=background, json=payload, headers=headers)
+        if response.status_code == requests.codes.ok:
+            parse_summary(response.content, hotel)
+        else:
+            logger.warning(f'summary of the hotel {hotel.hotel_id} is not received '
+                           f'(status code {response.status_code})')
+    except quota.QuotaExceeded:
+        if background:
+            raise
+        logger.warning(f'summary of the hotel {hotel.hotel_id} is over the request budget')
+    except requests.exceptions.RequestException:
+        logger.exception('ups... something went wrong')
+    except ValueError:
+        # the non-JSON or truncated body of the successful response (msgspec.DecodeError)
+        logger.exception(f'ups... the summary of the hotel {hotel.hotel_id} is not parsed')
+
+    return hotel
+
+
+def request_summaries(message: Message, hotels: List[Hotel]) -> Dict[Future, int]:
+    """Requests the summaries of the page hotels, which have not been prefetched. There is
+    no batching: the API has no request for several hotels, so every summary is a separate
+    request, they are only made at the same time by the summary workers over the kept alive
+    connections of the retry layer session
+
+    :param: message: current message
+    :type: message: Message object
+    :param: hotels: hotels of the page
+    :type: hotels: list with Hotel
+    :return: requests of the summaries with the indexes of the hotels on the page
+    :rtype: Dictionary[Future, int]"""
+
+    futures: Dict[Future, int] = dict()
+    for index, hotel in enumerate(hotels):
+        future: Optional[Future] = prefetch.take_prefetched(message, hotel)
+        if future is None:
+            future = summaries_executor.submit(fetch_hotel_summary, message, hotel)
+        futures[future] = index
+    return futures
+
+
 @logger_wraps()
 def gets_detailed_hotels_data(message: Message) -> None:
-    """Gets additional information about each hotel from the corresponding API endpoint and adds it
-    to a special dynamic attribute of the user data class
+    """Requests the summaries of the current page hotels at the same time (the summaries
+    prefetched in the background are reused) and displays each hotel as soon as its summary
+    is received. The order of the hotels is kept: the hotel received ahead of its turn waits
+    in the reorder buffer until the previous ones are displayed. The number of the received
+    summaries is shown in the progress message. In the compact render mode the descriptions
+    of the hotels without photos are collected and sent in the progress message together with
+    the closing keyboard, otherwise the progress message remains above the displayed hotels
 
     :param: message: current message
     :type: message: Message object
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    hotels_ids = list(current_user.current_buffer.keys())
-    hotels_count: int = current_user.hotels_count
-    buffer: OrderedDict[str, Dict] = current_user.current_buffer
-    for item in hotels_ids[:hotels_count]:
-        current_hotel: Dict[str, Union[str, int]] = buffer.get(item, "")
-        current_user.hotel_id = item
-        response: Response = create_request(message)
-        response_data = response.json().get("data").get("propertyInfo", "")
-        current_hotel["address"] = response_data.get("summary", "").get("location", "").get(
-            "address", "").get("addressLine", "")
-        current_hotel["rating"] = response_data.get("summary", "").get("overview", "").get(
-            "propertyRating", "").get("rating", "")
-        current_hotel["images"] = []
-
-        for item in response_data.get("propertyGallery", "").get("images", ""):
-            current_hotel["images"].append(item.get("image", "").get("url"))
-    result_displaying(message)
+    buffer: OrderedDict[str, Hotel] = current_user.current_buffer
+    hotels: List[Hotel] = list(buffer.values())[:current_user.hotels_count]
+    futures: Dict[Future, int] = request_summaries(message, hotels)
+    reorder_buffer = ReorderBuffer()
+    texts: List[str] = list()
+    for received, future in enumerate(as_completed(futures), start=1):
+        progress.update(message, f'*Загружаю отели {received}/{len(hotels)}*')
+        try:
+            hotel = future.result()
+        except requests.exceptions.RequestException:
+            # the prefetched summary, which has been rejected by the request budget
+            hotel = hotels[futures[future]]
+        for index, _ in reorder_buffer.push(futures[future], hotel):
+            text: Optional[str] = check_photo_answer(message, index=index)
+            if text:
+                texts.append(text)
+    if hotels and not texts:
+        progress.release(message, f'*Загружено отелей: {len(hotels)}*')
+    result_displaying(message, page=hotels, texts=texts)
 
 
 @logger_wraps()
@@ -371,9 +506,9 @@ def high_price(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    sorted_by_price_hotels: List[Tuple[str, Dict[Any]]] = sorted(
+    sorted_by_price_hotels: List[Tuple[str, Hotel]] = sorted(
         current_user.current_buffer.items(),
-        key=lambda x: x[1].get("price"),
+        key=lambda x: x[1].price,
         reverse=True
     )
     current_user.current_buffer = OrderedDict(sorted_by_price_hotels)
@@ -389,57 +524,75 @@ def best_deal(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    hotels: OrderedDict[str, Dict[Any]] = current_user.current_buffer
-    hotels_sorted_by_price_and_remoteness: List[Tuple[str, Dict[Any]]] = sorted(
+    hotels: OrderedDict[str, Hotel] = current_user.current_buffer
+    hotels_sorted_by_price_and_remoteness: List[Tuple[str, Hotel]] = sorted(
         hotels.items(),
-        key=lambda x: (current_user.maximum_distance >= x[1].get("remoteness") >= current_user.minimum_distance,
-                       current_user.maximum_price >= x[1].get("price") >= current_user.minimum_price)
+        key=lambda x: (current_user.maximum_distance >= x[1].remoteness >= current_user.minimum_distance,
+                       current_user.maximum_price >= x[1].price >= current_user.minimum_price)
     )
     current_user.current_buffer = OrderedDict(hotels_sorted_by_price_and_remoteness)
 
 
 @logger_wraps()
-def result_displaying(message: Message) -> None:
-    """Depending on the current number of hotels, displays them with or without photos.
-    After displaying, an inline keyboard is displayed, offering to continue the
-    search with the same parameters (if possible), start a new search or stop it
+def result_displaying(message: Message, page: Optional[List[Hotel]] = None,
+                      texts: Optional[List[str]] = None) -> None:
+    """After displaying the hotels, an inline keyboard is displayed, offering to continue the
+    search with the same parameters (if possible), start a new search or stop it. If there
+    are more hotels, their summaries are prefetched while the user is viewing the current page.
+    In the compact render mode the collected descriptions and the websites buttons of the page
+    hotels are sent in the same message with the keyboard. The number of the Bot API calls
+    and RapidAPI requests spent on the search so far is written to the log
 
     :param message: argument
     :type message: Message object
+    :param: page: records of the displayed hotels
+    :type: page: list with Hotel objects
+    :param: texts: descriptions of the hotels, which have not been sent yet
+    :type: texts: list with strings
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    hotels: OrderedDict[str, Dict[Any]] = current_user.current_buffer
+    hotels: OrderedDict[str, Hotel] = current_user.current_buffer
+    compact: bool = config.RENDER_MODE == 'compact'
+    text: str = ''.join(f'{i_text}\n' for i_text in texts or list())
+    page = page if compact else None
     if len(hotels.keys()) >= current_user.hotels_count:
-        for index in range(current_user.hotels_count):
-            check_photo_answer(message, index=index)
-        inline.show_more_hotels_if_there_are_available_variants(message)
+        inline.show_more_hotels_if_there_are_available_variants(message, text=text, hotels=page)
+        prefetch.prefetch_next_page(message)
     else:
-        for index in range(len(hotels.keys())):
-            check_photo_answer(message, hotels=hotels, index=index)
-        my_bot.send_message(chat_id=message.chat.id,
-                            text='*К сожалению мне удалось найти немного*'
-                                 '* меньше отелей(*',
-                            parse_mode='Markdown')
-        inline.show_more_hotels_if_nothing_to_show(message)
+        inline.show_more_hotels_if_nothing_to_show(
+            message, hotels=page,
+            text=text + '*К сожалению мне удалось найти немного*'
+                        '* меньше отелей(*\n')
+    counters: Dict[str, int] = metrics.chat(message.chat.id)
+    requests_made: int = sum(value for name, value in counters.items()
+                             if name.startswith('rapidapi_') and name.endswith('_requests'))
+    logger.info(f'{current_user.user_name} has spent on the search '
+                f'{counters.get("telegram_calls", 0)} Telegram calls ({config.RENDER_MODE} mode) '
+                f'and {requests_made} RapidAPI requests')
 
 
 @logger_wraps()
-def check_photo_answer(message: Message, index: int) -> None:
+def check_photo_answer(message: Message, index: int) -> Optional[str]:
     """Checks whether it is necessary to display photos of hotels and, depending on the user's answer,
-    calls the appropriate functions that send information about them
+    calls the appropriate functions that send information about them. The current hotel index
+    and id are written to the corresponding attributes of the user data class. In the compact
+    render mode the description of the hotel without photos is not sent, but returned
 
     :param message: argument
     :type message: Message object
     :param: index: index of current hotel in list
     :type: index: integer
-    :param: hotels:
-    :return: None"""
+    :return: description of the hotel, which is sent later, or None
+    :rtype: string"""
 
     current_user = UserData.get_user(message.chat.id)
     current_user.current_hotel_index = index
+    current_user.hotel_id = list(current_user.current_buffer.keys())[index]
     if current_user.answer_about_photo == 'ДА':
         gets_need_count_of_hotel_urls(message)
+    elif config.RENDER_MODE == 'compact':
+        return create_text_message(message)
     else:
         my_bot.send_message(chat_id=message.chat.id,
                             text=create_text_message(message),
@@ -457,11 +610,11 @@ def gets_need_count_of_hotel_urls(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    all_hotels: OrderedDict[str, Dict[Any]] = current_user.current_buffer
+    all_hotels: OrderedDict[str, Hotel] = current_user.current_buffer
     hotels_ids = list(all_hotels.keys())
     current_hotel_index: int = current_user.current_hotel_index
     current_hotel_id: str = hotels_ids[current_hotel_index]
-    hotel_photos: List[str] = all_hotels.get(current_hotel_id).get("images")
+    hotel_photos: List[str] = all_hotels.get(current_hotel_id).images
     try:
         if len(hotel_photos) < current_user.photo_count:
             raise ValueError
@@ -475,34 +628,113 @@ def gets_need_count_of_hotel_urls(message: Message) -> None:
 
 @logger_wraps()
 def create_media_group(message: Message, photo: List[Union[str]]) -> None:
-    """Creates a media group to send messages with photos
+    """Creates a media group to send messages with photos. The photos that have already been sent
+    are sent by their Telegram file ids (Telegram does not download them again), the file ids
+    of the new ones are saved when the queued media group is sent. In the compact render mode
+    the link to the hotel website is sent later with the closing keyboard
+
+    :param message: argument
+    :type message: Message object
+    :param: photo: url of hotel photos
+    :type: photo: List with strings
+    :return: None"""
+
+    file_ids: Dict[str, str] = database.get_file_ids(photo)
+    caption: str = create_text_message(message)
+    sent: QueuedCall = send_media_group(message, photo, file_ids, caption)
+    sent.add_done_callback(lambda call: save_file_ids(message, photo, file_ids, caption, call))
+
+    if config.RENDER_MODE == 'compact':
+        return
+    my_bot.send_message(chat_id=message.chat.id,
+                        text=templates.VISIT_WEBSITE,
+                        reply_markup=inline.visit_the_website(message),
+                        parse_mode='Markdown')
+
+
+def save_file_ids(message: Message, photo: List[str], file_ids: Dict[str, str], caption: str,
+                  sent: QueuedCall) -> None:
+    """Saves the file ids of the new photos of the sent media group. If Telegram has rejected
+    the saved file ids, they are forgotten and the media group is sent again by the urls
+    (it is called in the thread of the scheduler, when the media group is sent or has failed)
 
     :param message: argument
     :type message: Message object
     :param: photo: url of hotel photos
     :type: photo: List with strings
+    :param: file_ids: Telegram file ids, with which the media group was sent
+    :type: file_ids: Dictionary[str, str]
+    :param: caption: description of the hotel
+    :type: caption: string
+    :param: sent: the queued media group
+    :type: sent: QueuedCall
     :return: None"""
 
     try:
-        my_bot.send_media_group(message.chat.id,
-                                [InputMediaPhoto(url,
-                                                 caption=create_text_message(message))
-                                 if photo.index(url) == 0
-                                 else InputMediaPhoto(url)
-                                 for url in photo])
-        my_bot.send_message(chat_id=message.chat.id,
-                            text=emoji.emojize(
-                                '*Для просмотра дополнительных опций и фотографий *'
-                                '* посетите  :backhand_index_pointing_down:*'),
-                            reply_markup=inline.visit_the_website(message),
-                            parse_mode='Markdown')
-    except ApiTelegramException:
-        logger.exception('ups... something went wrong')
+        sent_messages: List[Message] = sent.result()
+    except ApiTelegramException as error:
+        if not file_ids or not rejected_file_ids(error):
+            logger.exception('ups... something went wrong')
+            return
+        logger.exception('ups... the saved file ids are not accepted')
+        database.delete_file_ids(list(file_ids.keys()))
+        resent: QueuedCall = send_media_group(message, photo, dict(), caption)
+        resent.add_done_callback(lambda call: save_file_ids(message, photo, dict(), caption, call))
+        return
+
+    new_file_ids: Dict[str, str] = {
+        url: sent_message.photo[-1].file_id
+        for url, sent_message in zip(photo, sent_messages)
+        if url not in file_ids and sent_message.photo
+    }
+    if new_file_ids:
+        database.add_file_ids(new_file_ids)
+
+
+def rejected_file_ids(error: ApiTelegramException) -> bool:
+    """Checks whether Telegram has failed to send the media group because of the saved file ids
+    (not because of the other reasons, e.g. the flood limit or the blocked bot)
+
+    :param: error: error of the Telegram API
+    :type: error: ApiTelegramException
+    :return: True, if the file ids are rejected
+    :rtype: bool"""
+
+    description: str = str(error.description).lower()
+    return error.error_code == 400 and any(marker in description for marker in FILE_ID_ERRORS)
+
+
+@logger_wraps()
+def send_media_group(message: Message, photo: List[str],
+                     file_ids: Dict[str, str], caption: str) -> QueuedCall:
+    """Sends the media group with the hotel photos (the description of the hotel is the caption
+    of the first photo)
+
+    :param message: argument
+    :type message: Message object
+    :param: photo: url of hotel photos
+    :type: photo: List with strings
+    :param: file_ids: Telegram file ids of the photos that have already been sent
+    :type: file_ids: Dictionary[str, str]
+    :param: caption: description of the hotel
+    :type: caption: string
+    :return: the queued media group (its result is the list of the sent messages)
+    :rtype: QueuedCall"""
+
+    return my_bot.send_media_group(message.chat.id,
+                                   [InputMediaPhoto(file_ids.get(url, url), caption=caption,
+                                                    parse_mode='Markdown')
+                                    if index == 0
+                                    else InputMediaPhoto(file_ids.get(url, url))
+                                    for index, url in enumerate(photo)])
 
 
 @logger_wraps()
 def create_text_message(message: Message) -> str:
-    """Creates and returns the text message with a description of each hotel
+    """Creates and returns the text message with a description of each hotel (by the precompiled
+    template). The description is rendered only once during the search, the next calls return
+    the remembered one. Displaying of the hotel is passed to the history writer, which saves
+    it in the background
 
     :param message: current message
     :type message: Message object
@@ -510,34 +742,19 @@ def create_text_message(message: Message) -> str:
     :rtype: string"""
 
     current_user = UserData.get_user(message.chat.id)
-    hotels: OrderedDict[str, Dict[Any]] = current_user.current_buffer
+    hotels: OrderedDict[str, Hotel] = current_user.current_buffer
     index: int = current_user.current_hotel_index
-    hotel_item: Dict[Any] = hotels.get(list(hotels.keys())[index])
+    hotel_item: Hotel = hotels.get(list(hotels.keys())[index])
+    if current_user.rendered_hotels is None:
+        current_user.rendered_hotels = dict()
+    current_message: Optional[str] = current_user.rendered_hotels.get(hotel_item.hotel_id)
+    if current_message is not None:
+        return current_message
     try:
-        # This design is used to determine the total length of stay at the hotel
-        date_diff: List[int] = [
-            int(m) for m in str(current_user.check_out - current_user.check_in)
-            if m.isdigit()
-        ]
-        if date_diff[0] == 0:
-            date_diff[0] = 1
-
-        current_message = emoji.emojize(
-            ':hotel: Название отеля: '
-            f'{hotel_item.get("name", "")}\n'
-            ':magnifying_glass_tilted_right: Адрес: '
-            f'{hotel_item.get("address", ":house_with_garden:")}\n'
-            ':bar_chart: Общий рейтинг отеля: '
-            f'{hotel_item.get("rating", ":smiling_face:")}\n'
-            f':pinching_hand: Расстояние от центра города: '
-            f'{hotel_item.get("remoteness")}\n'
-            ':coin: Цена за сутки: '
-            f'{round(hotel_item.get("price") / date_diff[0], 2)} USD\n'
-            f':money_bag: Цена за {date_diff[0]} дней проживания: '
-            f'{hotel_item.get("price")}'
-            f' USD\n'
-        )
-        database.add_results_to_database(message, result=current_message)
+        current_message = templates.render_hotel(
+            hotel_item, templates.nights(current_user.check_in, current_user.check_out))
+        current_user.rendered_hotels[hotel_item.hotel_id] = current_message
+        history.hotel_shown(message, hotel=hotel_item)
         return current_message
     except TypeError:
         logger.exception('oops... something went wrong')
@@ -556,7 +773,7 @@ def delete_showed_hotels(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    hotels: OrderedDict[str, Dict[Any]] = current_user.current_buffer
+    hotels: OrderedDict[str, Hotel] = current_user.current_buffer
     hotels_ids = list(hotels.keys())
     try:
         for index in range(current_user.hotels_count):
@@ -0,0 +1,87 @@
+"""Protocol of the inline buttons data.
+
+The data of the button is "<version><action>[:<argument>]", e.g. "1y" for the
+'yes' button or "1c:2:5f3a" for the third city of the list with the digest
+5f3a. The action is looked up in the router dictionary by its code, the city
+is taken from the list of the found cities by its index, and the digest of the
+list rejects the buttons of the old keyboards. The buttons of the previous
+versions of the protocol are rejected by the version"""
+
+import zlib
+from functools import lru_cache
+from typing import Optional, Tuple
+
+VERSION = '1'
+LIMIT = 64
+
+LOW_PRICE = 'l'
+HIGH_PRICE = 'h'
+BEST_DEAL = 'b'
+HISTORY = 'r'
+YES = 'y'
+NO = 'n'
+MORE_HOTELS = 'm'
+NEW_SEARCH = 's'
+END_SEARCH = 'e'
+CITY = 'c'
+
+Cities = Tuple[Tuple[str, str], ...]
+
+
+def encode(action: str, *arguments: object) -> str:
+    """Returns the data of the button
+
+    :param: action: code of the action
+    :type: action: string
+    :param: arguments: arguments of the action
+    :return: data of the button (not longer than 64 bytes)
+    :rtype: string"""
+
+    data: str = ':'.join((VERSION + action, *map(str, arguments)))
+    if len(data.encode()) > LIMIT:
+        raise ValueError(f'callback data {data!r} is longer than {LIMIT} bytes')
+    return data
+
+
+def decode(data: str) -> Optional[Tuple[str, str]]:
+    """Returns the code of the action and its argument (empty if there is none)
+    or None, if the data belongs to another version of the protocol
+
+    :param: data: data of the pressed button
+    :type: data: string
+    :return: code of the action and the argument
+    :rtype: Tuple[str, str]"""
+
+    if not data or data[0] != VERSION or len(data) < 2:
+        return None
+    return data[1], data[3:]
+
+
+@lru_cache(maxsize=256)
+def digest(cities: Cities) -> str:
+    """Returns the short digest of the found cities list"""
+
+    return format(zlib.crc32(repr(cities).encode()) & 0xffff, '04x')
+
+
+def city(index: int, cities: Cities) -> str:
+    """Returns the data of the button of the city from the found cities list"""
+
+    return encode(CITY, index, digest(cities))
+
+
+def selected_city(argument: str, cities: object) -> Optional[Tuple[str, str]]:
+    """Returns the name and the id of the selected city or None, if the button
+    belongs to another list of the cities (the keyboard is old)
+
+    :param: argument: argument of the city button
+    :type: argument: string
+    :param: cities: the found cities list of the user
+    :type: cities: tuple with the pairs of strings
+    :return: name and id of the city
+    :rtype: Tuple[str, str]"""
+
+    index, _, cities_digest = argument.partition(':')
+    if not isinstance(cities, tuple) or not index.isdigit() or cities_digest != digest(cities):
+        return None
+    return cities[int(index)] if int(index) < len(cities) else None
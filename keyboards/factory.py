@@ -0,0 +1,119 @@
+"""Factory of the bot keyboards.
+
+The keyboards are sent in the serialized (JSON) form, which Telegram
+accepts as is. The static keyboards are built and serialized once at import
+time, the dynamic ones are cached by their inputs, so no keyboard objects are
+created and no emoji are parsed while the messages are sent"""
+
+import json
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import emoji
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+from keyboards import callback_data as protocol
+from models.hotel import hotel_url
+
+Row = List[Dict[str, str]]
+
+MENU_TEXT: str = emoji.emojize('Меню   :desert_island:')
+
+
+def rows(*buttons: InlineKeyboardButton) -> List[Row]:
+    """Lays out the buttons the same way as InlineKeyboardMarkup.add does
+    (three buttons in a row) and returns the rows in the serializable form"""
+
+    return InlineKeyboardMarkup().add(*buttons).to_dict()['inline_keyboard']
+
+
+def serialize(keyboard_rows: List[Row]) -> str:
+    """Returns the inline keyboard with the given rows in the form sent to Telegram"""
+
+    return json.dumps({'inline_keyboard': keyboard_rows}, ensure_ascii=False)
+
+
+MENU_KEYBOARD: str = ReplyKeyboardMarkup(one_time_keyboard=False, resize_keyboard=True).add(
+    KeyboardButton(MENU_TEXT)).to_json()
+
+COMMANDS_KEYBOARD: str = serialize(rows(
+    InlineKeyboardButton(text=emoji.emojize('LOWPRICE  :money-mouth_face:'),
+                         callback_data=protocol.encode(protocol.LOW_PRICE)),
+    InlineKeyboardButton(text=emoji.emojize('HIGHPRICE  :zany_face:'),
+                         callback_data=protocol.encode(protocol.HIGH_PRICE)),
+    InlineKeyboardButton(text=emoji.emojize('BESTDEAL   :partying_face:'),
+                         callback_data=protocol.encode(protocol.BEST_DEAL)),
+    InlineKeyboardButton(text=emoji.emojize('HISTORY   :brain:'), callback_data=protocol.encode(protocol.HISTORY))
+))
+
+YES_NO_KEYBOARD: str = serialize(rows(
+    InlineKeyboardButton(text=emoji.emojize('ДА   :thumbs_up:'), callback_data=protocol.encode(protocol.YES)),
+    InlineKeyboardButton(text=emoji.emojize('НЕТ   :thumbs_down:'), callback_data=protocol.encode(protocol.NO))
+))
+
+MORE_HOTELS_ROWS: List[Row] = rows(
+    InlineKeyboardButton(text=emoji.emojize('Еще отели   :grinning_face_with_big_eyes:'),
+                         callback_data=protocol.encode(protocol.MORE_HOTELS)),
+    InlineKeyboardButton(text=emoji.emojize('Новый поиск   :star-struck:'),
+                         callback_data=protocol.encode(protocol.NEW_SEARCH)),
+    InlineKeyboardButton(text=emoji.emojize('Закончить   :face_with_spiral_eyes:'),
+                         callback_data=protocol.encode(protocol.END_SEARCH))
+)
+
+NEW_SEARCH_ROWS: List[Row] = rows(
+    InlineKeyboardButton(text=emoji.emojize('Новый поиск   :star-struck:'),
+                         callback_data=protocol.encode(protocol.NEW_SEARCH)),
+    InlineKeyboardButton(text=emoji.emojize('Закончить поиск   :face_with_spiral_eyes:'),
+                         callback_data=protocol.encode(protocol.END_SEARCH))
+)
+
+
+@lru_cache(maxsize=1024)
+def website_row(hotel_id: str, text: str = 'Сайт отеля') -> Row:
+    """Returns the row with the button that opens the hotel's website
+
+    :param: hotel_id: id of the hotel
+    :type: hotel_id: string
+    :param: text: text of the button
+    :type: text: string
+    :return: row of the inline keyboard
+    :rtype: list with the button"""
+
+    return [InlineKeyboardButton(text=text, url=hotel_url(hotel_id)).to_dict()]
+
+
+@lru_cache(maxsize=1024)
+def website_keyboard(hotel_id: str) -> str:
+    """Returns the keyboard with a single button that opens the hotel's website
+
+    :param: hotel_id: id of the hotel
+    :type: hotel_id: string
+    :return: serialized inline keyboard
+    :rtype: string"""
+
+    return serialize([website_row(hotel_id)])
+
+
+def websites_rows(hotels: Tuple[Tuple[str, str], ...]) -> List[Row]:
+    """Returns the rows with the buttons that open the websites of the hotels (one button in a row)
+
+    :param: hotels: ids and names of the hotels
+    :type: hotels: tuple with the pairs of strings
+    :return: rows of the inline keyboard
+    :rtype: list with the rows"""
+
+    return [website_row(hotel_id, name or 'Сайт отеля') for hotel_id, name in hotels]
+
+
+@lru_cache(maxsize=256)
+def cities_keyboard(cities: protocol.Cities) -> str:
+    """Returns the keyboard with the found cities (one city in a row, the button
+    contains the index of the city in the list)
+
+    :param: cities: names and destination ids of the cities
+    :type: cities: tuple with the pairs of strings
+    :return: serialized inline keyboard
+    :rtype: string"""
+
+    return serialize([[InlineKeyboardButton(text=name, callback_data=protocol.city(index, cities)).to_dict()]
+                      for index, (name, _) in enumerate(cities)])
@@ -1,11 +1,15 @@
-import emoji
-from telebot.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from typing import List, Optional
+
+from telebot.types import Message
 
 import handlers.handlers_before_request.handlers as handlers
+import keyboards.factory as factory
 from loader import my_bot
 from logger.logger import logger_wraps
 from models.calendar import MyTranslationCalendar
 from models.data_class import UserData
+from models.hotel import Hotel
+from utils import progress
 
 
 @logger_wraps()
@@ -15,7 +19,7 @@ def commands_keyboard(message: Message) -> None:
     the execution of the entire script).The id of the message with the inline keyboard is
     recorded in a special field of the User data class (also the flag field is activated),
     for its further deletion (if necessary). The displayed menu removes the previous inline
-    keyboards.
+    keyboards. The keyboard is built once (see keyboards.factory)
 
     :param message: current message
     :type message: Message object
@@ -23,20 +27,6 @@ def commands_keyboard(message: Message) -> None:
 
     current_user = UserData.get_user(message.chat.id)
 
-    keyboard = InlineKeyboardMarkup().add(
-        InlineKeyboardButton(
-            text=emoji.emojize('LOWPRICE  :money-mouth_face:'),
-            callback_data='/lowprice'),
-        InlineKeyboardButton(
-            text=emoji.emojize('HIGHPRICE  :zany_face:'),
-            callback_data='/highprice'),
-        InlineKeyboardButton(
-            text=emoji.emojize('BESTDEAL   :partying_face:'),
-            callback_data='/bestdeal'),
-        InlineKeyboardButton(
-            text=emoji.emojize('HISTORY   :brain:'),
-            callback_data='/history')
-    )
     result = my_bot.send_message(
         chat_id=message.chat.id,
         text='*Для выбора самых дешевых отелей выберите "lowprice"\n\n*'
@@ -44,8 +34,8 @@ def commands_keyboard(message: Message) -> None:
              '*Для выбора отелей, наиболее подходящих по цене\n*'
              '*и расположению от центра горда выберите "bestdeal"\n\n*'
              '*Для отображения истории поиска выберите "history"*',
-        reply_markup=keyboard, parse_mode='Markdown'
-    )
+        reply_markup=factory.COMMANDS_KEYBOARD, parse_mode='Markdown'
+    ).result()
     handlers.delete_previous_message(message)
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
@@ -53,7 +43,9 @@ def commands_keyboard(message: Message) -> None:
 
 @logger_wraps()
 def yes_no_keyboard(message: Message) -> None:
-    """Inline keyboard with answers the question about viewing photos of hotels.
+    """Inline keyboard with answers the question about viewing photos of hotels
+    (the question and the keyboard are sent in one message, the progress message of the request
+    is used for it, if there is one).
     The id of the message with the inline keyboard is recorded in a special field
     of the User data class (also the flag field is activated), for its further
     deletion (if necessary)
@@ -63,20 +55,10 @@ def yes_no_keyboard(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    keyboard = InlineKeyboardMarkup().add(
-        InlineKeyboardButton(
-            text=emoji.emojize('ДА   :thumbs_up:'),
-            callback_data='ДА'),
-        InlineKeyboardButton(
-            text=emoji.emojize('НЕТ   :thumbs_down:'),
-            callback_data='НЕТ')
-    )
-    my_bot.send_message(chat_id=message.chat.id,
-                        text='*Хотите посмотреть фотографии отелей ?*',
-                        parse_mode='Markdown')
-    result = my_bot.send_message(chat_id=message.chat.id,
-                                 text='*Я с удовольствием вам их покажу)*',
-                                 reply_markup=keyboard, parse_mode='Markdown')
+    result = progress.deliver(message,
+                              text='*Хотите посмотреть фотографии отелей ?*\n'
+                                   '*Я с удовольствием вам их покажу)*',
+                              reply_markup=factory.YES_NO_KEYBOARD)
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
 
@@ -97,14 +79,16 @@ def date_selection(message: Message) -> None:
     calendar, step = MyTranslationCalendar(locale='ru').build()
     result = my_bot.send_message(message.chat.id,
                                  f"Введите {MyTranslationCalendar.my_LSTEP[step]}",
-                                 reply_markup=calendar)
+                                 reply_markup=calendar).result()
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
 
 
 @logger_wraps()
 def cities_keyboard(message: Message) -> None:
-    """Keyboard with found  cities. The id of the message with the inline keyboard is recorded
+    """Keyboard with found  cities (shown in the progress message of the request, if there is one,
+    the keyboard is cached by the list of the cities).
+    The id of the message with the inline keyboard is recorded
     in a special field of the User data class (also the flags field is activated): 1 - for its
     further deletion (if necessary) 2 - for going  to the next function after selecting the city.
     The current state of the bot is changed.
@@ -114,15 +98,8 @@ def cities_keyboard(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-
-    keyboard = InlineKeyboardMarkup()
-    for i_element in current_user.current_buffer:
-        for key, value in i_element.items():
-            keyboard.add(InlineKeyboardButton(text=key, callback_data=value))
-
-    result = my_bot.send_message(chat_id=message.chat.id,
-                                 text='*Вот, что я нашел)*', reply_markup=keyboard,
-                                 parse_mode='Markdown')
+    keyboard: str = factory.cities_keyboard(current_user.current_buffer)
+    result = progress.deliver(message, text='*Вот, что я нашел)*', reply_markup=keyboard)
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
     current_user.zero_condition = False
@@ -130,55 +107,62 @@ def cities_keyboard(message: Message) -> None:
 
 
 @logger_wraps()
-def visit_the_website(message: Message) -> InlineKeyboardMarkup:
-    """Creates the keyboard with a single button that opens the hotel's website
+def visit_the_website(message: Message) -> str:
+    """Returns the keyboard with a single button that opens the hotel's website
+    (cached by the hotel id)
 
     :param message: current message
     :type message: Message object
-    :return: inline keyboard
-    :rtype: InlineKeyboardMarkup"""
+    :return: serialized inline keyboard
+    :rtype: string"""
 
     current_user = UserData.get_user(message.chat.id)
-    button = InlineKeyboardButton(
-        text='Сайт отеля',
-        url=f'https://hotels.com/h{current_user.hotel_id}.Hotel-information'
-    )
-    keyboard = InlineKeyboardMarkup().add(button)
-    return keyboard
+    return factory.website_keyboard(current_user.hotel_id)
+
+
+def hotels_websites(hotels: Optional[List[Hotel]]) -> List[factory.Row]:
+    """Returns the rows with the buttons that open the websites of the displayed hotels
+    (one button in a row). Other rows can be added after them
+
+    :param hotels: records of the displayed hotels
+    :type hotels: list with Hotel objects
+    :return: rows of the inline keyboard
+    :rtype: list with the rows"""
+
+    return factory.websites_rows(tuple((hotel.hotel_id, hotel.name) for hotel in hotels or list()))
 
 
 @logger_wraps()
-def show_more_hotels_if_there_are_available_variants(message: Message) -> None:
+def show_more_hotels_if_there_are_available_variants(message: Message, text: str = '',
+                                                     hotels: Optional[List[Hotel]] = None) -> None:
     """After the first displaying of the specified number of hotels, it offers to load
-    more hotels with the same parameters, start a new searching or stop it.
-    The id of the inline keyboard is recorded for later deletion. The current state
-    of the bot is changed.
+    more hotels with the same parameters, start a new searching or stop it. Everything is sent
+    in one message: the given text (e.g. descriptions of the displayed hotels), the buttons
+    with the websites of the given hotels and the offer itself (the progress message of the request
+    is used for it, if there is one).
+    The id of the inline keyboard is recorded for later deletion (the websites buttons are kept
+    with the displayed hotels). The current state of the bot is changed.
 
-     :param message: current message
+    :param message: current message
     :type message: Message object
+    :param text: the text preceding the offer
+    :type text: string
+    :param hotels: records of the hotels, whose websites buttons are added to the keyboard
+    :type hotels: list with Hotel objects
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    keyboard = InlineKeyboardMarkup().add(
-        InlineKeyboardButton(
-            text=emoji.emojize('Еще отели   :grinning_face_with_big_eyes:'),
-            callback_data='Загрузить еще отели'),
-        InlineKeyboardButton(
-            text=emoji.emojize('Новый поиск   :star-struck:'),
-            callback_data='Новый поиск'),
-        InlineKeyboardButton(
-            text=emoji.emojize('Закончить   :face_with_spiral_eyes:'),
-            callback_data='Закончить поиск')
-    )
-    my_bot.send_message(chat_id=message.chat.id,
-                        text='*Хотите продолжить просмотр отелей *'
-                             '* с теми же параметрами? *',
-                        parse_mode='Markdown')
-    result = my_bot.send_message(chat_id=message.chat.id,
-                                 text='*Я с удовольствием вам их покажу)*',
-                                 reply_markup=keyboard, parse_mode='Markdown')
+    websites: List[factory.Row] = hotels_websites(hotels)
+    keyboard: str = factory.serialize(websites + factory.MORE_HOTELS_ROWS)
+    result = progress.deliver(message,
+                              text=text +
+                                   '*Хотите продолжить просмотр отелей *'
+                                   '* с теми же параметрами? *\n'
+                                   '*Я с удовольствием вам их покажу)*',
+                              reply_markup=keyboard, disable_web_page_preview=True)
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
+    current_user.kept_keyboard = factory.serialize(websites) if websites else None
     current_user.fourth_condition = False
     current_user.continue_searching = False
     current_user.fifth_condition = True
@@ -186,32 +170,34 @@ def show_more_hotels_if_there_are_available_variants(message: Message) -> None:
 
 
 @logger_wraps()
-def show_more_hotels_if_nothing_to_show(message: Message) -> None:
+def show_more_hotels_if_nothing_to_show(message: Message, text: str = '',
+                                        hotels: Optional[List[Hotel]] = None) -> None:
     """Suggests starting a new search or ending the search when there
-    are no more hotels by the specified parameter. The id of the inline keyboard
-    is recorded for later deletion. The current state of the bot is changed
+    are no more hotels by the specified parameter. Everything is sent in one message:
+    the given text, the buttons with the websites of the given hotels and the suggestion itself
+    (the progress message of the request is used for it, if there is one).
+    The id of the inline keyboard is recorded for later deletion (the websites buttons are kept
+    with the displayed hotels). The current state of the bot is changed
 
     :param message: current message
     :type message: Message object
+    :param text: the text preceding the suggestion
+    :type text: string
+    :param hotels: records of the hotels, whose websites buttons are added to the keyboard
+    :type hotels: list with Hotel objects
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    keyboard = InlineKeyboardMarkup().add(
-        InlineKeyboardButton(
-            text=emoji.emojize('Новый поиск   :star-struck:'),
-            callback_data='Новый поиск'),
-        InlineKeyboardButton(
-            text=emoji.emojize('Закончить поиск   :face_with_spiral_eyes:'),
-            callback_data='Закончить поиск')
-    )
-    my_bot.send_message(chat_id=message.chat.id,
-                        text='*Больше по по вашему запросу ничего не найдено.*'
-                             '* Хотите поискать новые отели?*',
-                        parse_mode='Markdown')
-    result = my_bot.send_message(chat_id=message.chat.id,
-                                 text='*Я с удовольствием вам их покажу)*',
-                                 reply_markup=keyboard, parse_mode='Markdown')
+    websites: List[factory.Row] = hotels_websites(hotels)
+    keyboard: str = factory.serialize(websites + factory.NEW_SEARCH_ROWS)
+    result = progress.deliver(message,
+                              text=text +
+                                   '*Больше по по вашему запросу ничего не найдено.*'
+                                   '* Хотите поискать новые отели?*\n'
+                                   '*Я с удовольствием вам их покажу)*',
+                              reply_markup=keyboard, disable_web_page_preview=True)
     current_user.id_message_for_delete = result.message_id
     current_user.delete_message = True
+    current_user.kept_keyboard = factory.serialize(websites) if websites else None
     current_user.start_from_the_beginning_if_there_is_something_to_show = False
     current_user.start_from_the_beginning_if_nothing_to_show = True
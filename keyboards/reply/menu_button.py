@@ -1,19 +1,12 @@
-import emoji
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton
-
+import keyboards.factory as factory
 from logger.logger import logger_wraps
 
 
 @logger_wraps()
-def menu_button() -> ReplyKeyboardMarkup:
-    """Create menu button and return it
+def menu_button() -> str:
+    """Return the menu button (the keyboard is built once, see keyboards.factory)
 
-    :return: menu button
-    :rtype: ReplyKeyboardMarkup"""
+    :return: serialized menu button
+    :rtype: string"""
 
-    keyboard = ReplyKeyboardMarkup(one_time_keyboard=False,
-                                   resize_keyboard=True)
-    keyboard.add(KeyboardButton(
-        emoji.emojize('Меню   :desert_island:'))
-    )
-    return keyboard
+    return factory.MENU_KEYBOARD
@@ -1,5 +1,15 @@
 from telebot import TeleBot
 
 import config
+from database.sessions import SessionTeleBot
+from utils.rate_limiter import OutboundScheduler
 
-my_bot = TeleBot(token=config.BOT_TOKEN)
+my_bot: TeleBot = SessionTeleBot(
+    token=config.BOT_TOKEN,
+    num_threads=config.BOT_THREADS,
+    scheduler=OutboundScheduler(global_rate=config.TELEGRAM_GLOBAL_RATE,
+                                chat_rate=config.TELEGRAM_CHAT_RATE,
+                                chat_burst=config.TELEGRAM_CHAT_BURST,
+                                workers=config.TELEGRAM_WORKERS,
+                                max_chats=config.TELEGRAM_CHAT_BUCKETS)
+)
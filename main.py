@@ -4,6 +4,9 @@ from telebot.apihelper import ApiTelegramException
 from urllib3.exceptions import ReadTimeoutError
 
 from database.database_methods import create_database
+from database.destinations import load_destinations
+from database.maintenance import start_maintenance
+from database.users import load_users
 from loader import my_bot
 from logger.logger import logger
 from utils.set_bot_commands import set_default_commands
@@ -15,6 +18,9 @@ if __name__ == '__main__':
     try:
         set_default_commands(my_bot)
         create_database()
+        load_users()
+        load_destinations()
+        start_maintenance()
         my_bot.infinity_polling(timeout=0)
     except (ConnectionError, ReadTimeoutError, InternalError,
             ApiTelegramException):
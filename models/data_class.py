@@ -1,5 +1,8 @@
+from concurrent.futures import Future
 from datetime import date
-from typing import List, Dict, Optional, OrderedDict
+from typing import Callable, List, Dict, Optional, OrderedDict, Tuple
+
+from models.hotel import Hotel
 
 
 class UserData:
@@ -82,20 +85,40 @@ class UserData:
     :type: id_message_for_delete: string
     :param: delete_message: the presence of the message that can be deleted 
     :type: delete_message: bool
+    :param: kept_keyboard: the buttons which remain, when the message with inline keyboard is "deleted"
+    (the message with the displayed hotels is not deleted, only the other buttons are removed from it)
+    :type: kept_keyboard: string (serialized inline keyboard)
     :param: current_buffer: When call the API for the first time: contains the cities which were found. 
-    When call the  API for the second time: contains hotels which were found by destination_id. 
-    :type: current_buffer: list of dictionaries or ordered dictionary
-    :param: connect_attempt: number of API call attempts made 
-    :type: connect_attempt: integer
+    When call the  API for the second time: contains records of the hotels which were found by destination_id. 
+    :type: current_buffer: list of dictionaries (then tuple with the names and the ids of the cities)
+    or ordered dictionary with Hotel objects
     :param: start_from_the_beginning_if_there_is_something_to_show: the display of the specified 
     number of hotels has been made
     :type: start_from_the_beginning_if_there_is_something_to_show: bool
     :param: start_from_the_beginning_if_nothing_to_show: no more hotels were found 
     according to the specified parameters
     :type: start_from_the_beginning_if_nothing_to_show: bool
+    :param: prefetched_summaries: requests of the next page hotels summaries, started in the background
+    while the user is viewing the current page 
+    :type: prefetched_summaries: dictionary with hotels ids as keys and Future objects as values
+    :param: prefetch_spent: number of the summaries prefetched during the current search
+    :type: prefetch_spent: integer
+    :param: speculative_properties: the provisional request of the hotels list, started after selecting
+    the check-in date, and the search parameters with which it was made
+    :type: speculative_properties: tuple with the parameters and the Future object
+    :param: search_id: number of the current search in the history (assigned when the first hotel
+    is displayed)
+    :type: search_id: integer
+    :param: rendered_hotels: descriptions of the hotels displayed during the current search
+    :type: rendered_hotels: dictionary with hotels ids as keys and strings as values
+    :param: progress_message: the message, which shows the stages of the current request
+    and becomes its result
+    :type: progress_message: ProgressMessage object
     """""
 
     all_users: dict = dict()
+    # restores the saved session of the chat, which is not in memory yet (set by database.sessions)
+    session_loader: Optional[Callable[[int], Optional['UserData']]] = None
 
     def __init__(self):
         self.user_name: str is None
@@ -127,15 +150,22 @@ class UserData:
         self.next_function: str is None
         self.id_message_for_delete: str is None
         self.delete_message: bool = False
-        self.current_buffer: Optional[List[Dict], OrderedDict[str, Dict]] is None
-        self.connect_attempt: int = 0
+        self.kept_keyboard: Optional[str] = None
+        self.current_buffer: Optional[List[Dict], OrderedDict[str, Hotel]] is None
         self.start_from_the_beginning_if_there_is_something_to_show: bool = False
         self.start_from_the_beginning_if_nothing_to_show: bool = False
+        self.prefetched_summaries: Optional[Dict[str, Future]] = None
+        self.prefetch_spent: int = 0
+        self.speculative_properties: Optional[Tuple[Tuple, Future]] = None
+        self.search_id: Optional[int] = None
+        self.rendered_hotels: Optional[Dict[str, str]] = None
+        self.progress_message: Optional['ProgressMessage'] = None
 
     @staticmethod
     def get_user(chat_id):
         """Accepts a unique chat ID with the user as a key and returns the user
-         object from the dictionary, if such exists, either creates a new one,
+         object from the dictionary, if such exists, either restores the saved session
+         of the chat (after the restart of the bot) or creates a new one,
          adds it to the dictionary and also returns from there
 
         :param: chat_id: id of the user's chat
@@ -144,14 +174,27 @@ class UserData:
         :rtype: User object"""
 
         if UserData.all_users.get(chat_id) is None:
-            UserData.all_users[chat_id] = UserData()
+            restored = UserData.session_loader(chat_id) if UserData.session_loader else None
+            UserData.all_users.setdefault(chat_id, restored or UserData())
         return UserData.all_users.get(chat_id)
 
+    def cancel_prefetched_requests(self):
+        """Cancels the prefetched requests of the hotels summaries and the speculative request
+        of the hotels list, which have not been started yet, and forgets all of them"""
+
+        for future in (self.prefetched_summaries or dict()).values():
+            future.cancel()
+        self.prefetched_summaries = None
+        if self.speculative_properties is not None:
+            self.speculative_properties[1].cancel()
+            self.speculative_properties = None
+
     def clear_all(self):
         """Updates the values of all dynamic attributes of the user data-class object
     and sets the value to None or bool (the value of user_name remains unchanged, for the subsequent
-    correct operation of the bot)"""
+    correct operation of the bot). The prefetched requests are cancelled"""
 
+        self.cancel_prefetched_requests()
         for i_elem in self.__dict__:
             if i_elem == 'date_flag':
                 self.__dict__[i_elem] = False
@@ -173,13 +216,13 @@ class UserData:
                 self.__dict__[i_elem] = False
             elif i_elem == 'delete_message':
                 self.__dict__[i_elem] = False
-            elif i_elem == 'connect_attempt':
-                self.__dict__[i_elem] = 0
             elif i_elem == 'start_from_the_beginning_if_there_is_something_to_show':
                 self.__dict__[i_elem] = False
             elif i_elem == 'start_from_the_beginning_if_nothing_to_show':
                 self.__dict__[i_elem] = False
             elif i_elem == 'continue_searching':
                 self.__dict__[i_elem] = False
+            elif i_elem == 'prefetch_spent':
+                self.__dict__[i_elem] = 0
             else:
                 self.__dict__[i_elem] = None
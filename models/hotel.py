@@ -0,0 +1,48 @@
+from typing import List, Optional
+
+
+def hotel_url(hotel_id: str) -> str:
+    """Returns the url of the hotel's page on hotels.com
+
+    :param: hotel_id: id of the hotel
+    :type: hotel_id: string
+    :return: url of the hotel's page
+    :rtype: string"""
+
+    return f'https://hotels.com/h{hotel_id}.Hotel-information'
+
+
+class Hotel:
+    """Class of the hotel record, which contains only the data
+    displayed by the bot (the raw data of the API responses is not stored)
+
+    :param: hotel_id: id of the hotel
+    :type: hotel_id: string
+    :param: name: name of the hotel
+    :type: name: string
+    :param: price: price for the whole period of stay (in USD)
+    :type: price: float
+    :param: remoteness: distance from the city center (in km)
+    :type: remoteness: float
+    :param: address: address of the hotel (None until the summary of the hotel is received)
+    :type: address: string
+    :param: rating: overall rating of the hotel (None until the summary of the hotel is received)
+    :type: rating: float
+    :param: images: urls of the hotel photos
+    :type: images: list with strings"""
+
+    __slots__ = ('hotel_id', 'name', 'price', 'remoteness', 'address', 'rating', 'images')
+
+    def __init__(self, hotel_id: str, name: str = '', price: float = 0,
+                 remoteness: float = 0, address: Optional[str] = None,
+                 rating: Optional[float] = None, images: Optional[List[str]] = None):
+        self.hotel_id: str = hotel_id
+        self.name: str = name
+        self.price: float = price
+        self.remoteness: float = remoteness
+        self.address: Optional[str] = address
+        self.rating: Optional[float] = rating
+        self.images: List[str] = images if images is not None else []
+
+    def __repr__(self) -> str:
+        return f'Hotel({self.hotel_id!r}, {self.name!r}, price={self.price!r})'
@@ -0,0 +1,144 @@
+"""Common fixtures of the behaviour tests.
+
+The tests check the state machines of the bot (the circuit breakers, the request
+budgets, the callback data protocol, the search sessions) without the network:
+the time is given by the fake clock and the RapidAPI session answers with the
+prepared responses"""
+
+import os
+from collections import OrderedDict
+from typing import List, Union
+
+import pytest
+
+os.environ.setdefault('BOT_TOKEN', '123456:tests')
+os.environ.setdefault('RAPID_API_KEY', 'tests')
+
+from playhouse.pool import PooledDatabase  # noqa: E402
+from requests.models import Response  # noqa: E402
+
+from database import sessions  # noqa: E402
+from logger.logger import logger  # noqa: E402
+from models.data_class import UserData  # noqa: E402
+from models.database import db, Session  # noqa: E402
+from utils import quota, retry  # noqa: E402
+
+
+class Clock:
+    """Fake time module: time.monotonic stands still until the test moves it
+    (also by time.sleep of the code under test)
+
+    :param: now: current moment
+    :type: now: float"""
+
+    def __init__(self):
+        self.now: float = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeSession:
+    """RapidAPI session, which answers with the prepared responses (or raises the prepared exceptions)
+
+    :param: answers: the answers in the order of the requests
+    :type: answers: list with Response objects and exceptions
+    :param: requests: number of the made requests
+    :type: requests: integer"""
+
+    def __init__(self):
+        self.answers: List[Union[Response, Exception]] = list()
+        self.requests: int = 0
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        self.requests += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def make_response(status_code: int, content: bytes = b'{}') -> Response:
+    """Builds the requests response object
+
+    :param: status_code: HTTP status code
+    :type: status_code: integer
+    :param: content: body of the response
+    :type: content: bytes
+    :return: response
+    :rtype: Response object"""
+
+    response = Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temporary_log(tmp_path_factory) -> None:
+    """Redirects the log of the bot to the temporary file (the tests do not write
+    to the production log)"""
+
+    logger.remove()
+    logger.add(str(tmp_path_factory.mktemp('logger') / 'log_file.log'))
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    """Fake clock of the retry layer and of the request budgets"""
+
+    fake = Clock()
+    monkeypatch.setattr(retry, 'time', fake)
+    monkeypatch.setattr(quota, 'time', fake)
+    quota.quota.minute_started = fake.now
+    return fake
+
+
+@pytest.fixture
+def session(monkeypatch) -> FakeSession:
+    """Fake RapidAPI session of the retry layer"""
+
+    fake = FakeSession()
+    monkeypatch.setattr(retry, 'session', fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch) -> None:
+    """New request budgets, circuit breakers and saved responses for every test"""
+
+    monkeypatch.setattr(quota, 'quota', quota.Quota())
+    monkeypatch.setattr(retry, 'responses', OrderedDict())
+    for endpoint in retry.ENDPOINTS.values():
+        monkeypatch.setattr(endpoint, 'breaker', retry.CircuitBreaker(3, 30))
+
+
+def close_database() -> None:
+    """Closes the connections of the database (also the ones kept in the pool)"""
+
+    db.close()
+    if isinstance(db, PooledDatabase):
+        db.close_all()
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch) -> None:
+    """Sessions table in the temporary database, no users and no checkpoints
+    (the writer thread is not started, the test writes the checkpoints by flush).
+    The database of the bot is bound back after the test"""
+
+    bound: str = db.database
+    close_database()
+    db.init(str(tmp_path / 'hotels.db'))
+    with db:
+        db.create_tables([Session])
+    monkeypatch.setattr(UserData, 'all_users', dict())
+    monkeypatch.setattr(sessions, 'pending', dict())
+    monkeypatch.setattr(sessions, 'written', dict())
+    monkeypatch.setattr(sessions, 'start_writer', lambda: None)
+    yield
+    close_database()
+    db.init(bound)
@@ -0,0 +1,60 @@
+"""Behaviour of the protocol of the inline buttons data"""
+
+import json
+
+import pytest
+
+from handlers.default_handlers.handlers import CALLBACK_ROUTES
+from keyboards import callback_data as protocol, factory
+
+CITIES = (('Рим, Лацио, Италия', '3023'), ('Рим, Джорджия, США', '9701'), ('Ромы, Сумская область', '553248'))
+
+
+def test_action_without_argument_round_trip() -> None:
+    data = protocol.encode(protocol.YES)
+    assert data == '1y'
+    assert protocol.decode(data) == (protocol.YES, '')
+
+
+def test_city_button_round_trip() -> None:
+    data = protocol.city(2, CITIES)
+    action, argument = protocol.decode(data)
+    assert action == protocol.CITY
+    assert protocol.selected_city(argument, CITIES) == CITIES[2]
+
+
+def test_data_over_the_telegram_limit_is_refused() -> None:
+    with pytest.raises(ValueError):
+        protocol.encode(protocol.CITY, 'x' * protocol.LIMIT)
+
+
+@pytest.mark.parametrize('data', ['', '1', '0y', 'lowprice', '{"city": "3023"}'])
+def test_data_of_other_versions_is_rejected(data) -> None:
+    assert protocol.decode(data) is None
+
+
+def test_digest_is_stable_and_short() -> None:
+    assert protocol.digest(CITIES) == protocol.digest(tuple(list(CITIES)))
+    assert len(protocol.digest(CITIES)) == 4
+    assert protocol.digest(CITIES) != protocol.digest(CITIES[:2])
+
+
+def test_button_of_the_old_list_is_rejected() -> None:
+    _, argument = protocol.decode(protocol.city(0, CITIES))
+    assert protocol.selected_city(argument, CITIES[1:]) is None
+    assert protocol.selected_city(argument, None) is None
+
+
+@pytest.mark.parametrize('argument', ['3', 'x:{}', '5:{}', '-1:{}'])
+def test_malformed_city_argument_is_rejected(argument) -> None:
+    assert protocol.selected_city(argument.format(protocol.digest(CITIES)), CITIES) is None
+
+
+def test_every_button_of_the_keyboards_is_routed() -> None:
+    keyboards = [json.loads(factory.COMMANDS_KEYBOARD)['inline_keyboard'], factory.MORE_HOTELS_ROWS,
+                 factory.NEW_SEARCH_ROWS, json.loads(factory.YES_NO_KEYBOARD)['inline_keyboard'],
+                 json.loads(factory.cities_keyboard(CITIES))['inline_keyboard']]
+    for keyboard in keyboards:
+        for row in keyboard:
+            for button in row:
+                assert protocol.decode(button['callback_data'])[0] in CALLBACK_ROUTES
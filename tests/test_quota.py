@@ -0,0 +1,99 @@
+"""Behaviour of the request budgets (minute, daily, per user and the background reserve)"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import config
+from conftest import make_response
+from utils import quota, retry
+
+URL = 'https://hotels4.p.rapidapi.com/properties/v2/get-summary'
+
+
+@pytest.fixture
+def budgets(monkeypatch) -> None:
+    """Small budgets: 10 requests per minute, 20 per day, 5 per user and 20% of reserve"""
+
+    monkeypatch.setattr(config, 'QUOTA_PER_MINUTE', 10)
+    monkeypatch.setattr(config, 'QUOTA_DAILY', 20)
+    monkeypatch.setattr(config, 'QUOTA_USER_DAILY', 5)
+    monkeypatch.setattr(config, 'QUOTA_RESERVE', 0.2)
+
+
+def spend(count: int, chat_id=None, background: bool = False) -> None:
+    for _ in range(count):
+        quota.acquire('summary', chat_id=chat_id, background=background)
+
+
+def test_minute_window_is_rolled_after_a_minute(clock, budgets) -> None:
+    spend(10)
+    with pytest.raises(quota.QuotaExceeded):
+        spend(1)
+
+    clock.sleep(59)
+    assert not quota.available(background=False)
+    clock.sleep(1)
+    spend(10)
+    assert quota.quota.day_count == 20
+
+
+def test_daily_budget_is_rolled_on_the_next_day(clock, budgets, monkeypatch) -> None:
+    for _ in range(2):
+        spend(10)
+        clock.sleep(60)
+    with pytest.raises(quota.QuotaExceeded):
+        spend(1)
+
+    tomorrow = date.today() + timedelta(days=1)
+    monkeypatch.setattr(quota, 'date', type('Tomorrow', (), {'today': staticmethod(lambda: tomorrow)}))
+    spend(1)
+    assert quota.quota.day_count == 1
+
+
+def test_user_budget_does_not_limit_other_users(clock, budgets) -> None:
+    spend(5, chat_id=1)
+    with pytest.raises(quota.QuotaExceeded):
+        spend(1, chat_id=1)
+    spend(1, chat_id=2)
+    spend(1)
+
+
+def test_background_requests_keep_the_reserve(clock, budgets) -> None:
+    spend(8, background=True)
+    with pytest.raises(quota.QuotaExceeded):
+        spend(1, background=True)
+    assert not quota.available(background=True)
+    assert quota.available(background=False)
+    spend(2)
+
+
+def test_reported_remaining_requests_limit_the_budget(clock, budgets) -> None:
+    response = make_response(200)
+    response.headers['X-RateLimit-Requests-Remaining'] = '1'
+    response.headers['X-RateLimit-Requests-Reset'] = '120'
+    quota.record(response)
+    spend(1)
+    with pytest.raises(quota.QuotaExceeded):
+        spend(1)
+
+    clock.sleep(120)
+    spend(1)
+
+
+def test_spent_budget_does_not_lock_the_trial_of_the_breaker(clock, budgets, session) -> None:
+    breaker = retry.ENDPOINTS['summary'].breaker
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    clock.sleep(breaker.reset_timeout)
+    spend(10)
+
+    with pytest.raises(quota.QuotaExceeded):
+        retry.request('summary', 'GET', URL, params={'propertyId': '1'})
+    assert not breaker.trial
+    assert session.requests == 0
+
+    clock.sleep(60)
+    session.answers = [make_response(200)]
+    assert retry.request('summary', 'GET', URL, params={'propertyId': '1'}).status_code == 200
+    assert breaker.opened is None
@@ -0,0 +1,109 @@
+"""Behaviour of the circuit breakers and of the retries of the RapidAPI requests"""
+
+import pytest
+import requests
+
+from conftest import make_response
+from utils import retry
+
+URL = 'https://hotels4.p.rapidapi.com/locations/v3/search'
+
+
+def open_breaker(breaker: retry.CircuitBreaker) -> None:
+    for _ in range(breaker.threshold):
+        breaker.failure()
+
+
+def test_breaker_opens_after_threshold_failures(clock) -> None:
+    breaker = retry.CircuitBreaker(threshold=3, reset_timeout=30)
+    breaker.failure()
+    breaker.failure()
+    assert breaker.allow()
+
+    breaker.failure()
+    assert breaker.opened == clock.now
+    assert not breaker.allow()
+
+
+def test_success_resets_failures_in_a_row(clock) -> None:
+    breaker = retry.CircuitBreaker(threshold=3, reset_timeout=30)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.opened is None and breaker.allow()
+
+
+def test_only_one_trial_after_reset_timeout(clock) -> None:
+    breaker = retry.CircuitBreaker(threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.sleep(29)
+    assert not breaker.allow()
+
+    clock.sleep(1)
+    assert breaker.allow()
+    assert breaker.trial
+    assert not breaker.allow()
+
+
+def test_successful_trial_closes_breaker(clock) -> None:
+    breaker = retry.CircuitBreaker(threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.sleep(30)
+    assert breaker.allow()
+
+    breaker.success()
+    assert breaker.opened is None and not breaker.trial
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_opens_breaker_again(clock) -> None:
+    breaker = retry.CircuitBreaker(threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.sleep(30)
+    assert breaker.allow()
+
+    breaker.failure()
+    assert breaker.opened == clock.now and not breaker.trial
+    assert not breaker.allow()
+    clock.sleep(30)
+    assert breaker.allow()
+
+
+def test_request_is_repeated_after_server_error(clock, session) -> None:
+    session.answers = [make_response(503), make_response(200)]
+
+    response = retry.request('locations', 'GET', URL, params={'q': 'rome'})
+    assert response.status_code == 200
+    assert session.requests == 2
+    assert retry.ENDPOINTS['locations'].breaker.failures == 0
+
+
+def test_client_error_is_returned_at_once(clock, session) -> None:
+    session.answers = [make_response(404)]
+
+    assert retry.request('locations', 'GET', URL, params={'q': 'rome'}).status_code == 404
+    assert session.requests == 1
+
+
+def test_saved_response_is_returned_while_breaker_is_open(clock, session) -> None:
+    session.answers = [make_response(200, b'{"saved": true}')]
+    retry.request('locations', 'GET', URL, params={'q': 'rome'})
+    open_breaker(retry.ENDPOINTS['locations'].breaker)
+
+    response = retry.request('locations', 'GET', URL, params={'q': 'rome'})
+    assert response.content == b'{"saved": true}'
+    assert session.requests == 1
+
+    with pytest.raises(retry.UpstreamUnavailable):
+        retry.request('locations', 'GET', URL, params={'q': 'paris'})
+
+
+def test_failures_of_all_attempts_open_breaker(clock, session) -> None:
+    session.answers = [requests.exceptions.ConnectionError()] * 3
+
+    with pytest.raises(retry.UpstreamUnavailable):
+        retry.request('locations', 'GET', URL, params={'q': 'rome'})
+    assert session.requests == 3
+    assert retry.ENDPOINTS['locations'].breaker.opened is not None
@@ -0,0 +1,117 @@
+"""Behaviour of the search sessions (the snapshots, the checkpoints and their writing)"""
+
+from collections import OrderedDict
+from datetime import date
+
+import pytest
+
+from database import sessions
+from handlers.handlers_before_request import handlers as steps
+from models.data_class import UserData
+from models.database import db, Session
+from models.hotel import Hotel
+
+CHAT_ID = 7
+
+
+def searching_user() -> UserData:
+    user = UserData()
+    user.user_name = 'Анна'
+    user.current_command = '/bestdeal'
+    user.city = 'Рим'
+    user.destination_id = '3023'
+    user.minimum_price = 50
+    user.zero_condition = True
+    user.fourth_condition = True
+    user.check_in = date(2026, 11, 1)
+    user.check_out = date(2026, 11, 4)
+    user.next_function = steps.minimum_price
+    return user
+
+
+def broken_delete(cls):
+    raise OSError('disk I/O error')
+
+
+def saved_rows() -> dict:
+    with db:
+        return {int(row.chat_id): row.data for row in Session.select()}
+
+
+def test_snapshot_of_the_search_is_loaded_back() -> None:
+    user = searching_user()
+    user.current_buffer = (('Рим, Лацио, Италия', '3023'), ('Рим, Джорджия, США', '9701'))
+    data = sessions.snapshot(user, [sessions.Handler(steps.check_in)])
+
+    restored, next_steps = sessions.load(data)
+    for name in ('user_name', 'current_command', 'city', 'destination_id', 'minimum_price'):
+        assert getattr(restored, name) == getattr(user, name)
+    assert restored.zero_condition and restored.fourth_condition and not restored.first_condition
+    assert (restored.check_in, restored.check_out) == (date(2026, 11, 1), date(2026, 11, 4))
+    assert restored.current_buffer == user.current_buffer
+    assert restored.next_function is steps.minimum_price
+    assert next_steps == [steps.check_in]
+
+
+def test_found_hotels_are_loaded_back_in_their_order() -> None:
+    user = searching_user()
+    user.current_buffer = OrderedDict((hotel.hotel_id, hotel) for hotel in
+                                      (Hotel('2', 'Roma', 300.0, 1.5, 'Via Roma, 1', 8.6, ['a.jpg']),
+                                       Hotel('1', 'Lazio', 120.0, 4.0)))
+
+    restored, _ = sessions.load(sessions.snapshot(user, []))
+    assert list(restored.current_buffer) == ['2', '1']
+    hotel = restored.current_buffer['2']
+    assert (hotel.name, hotel.price, hotel.address, hotel.rating, hotel.images) == \
+           ('Roma', 300.0, 'Via Roma, 1', 8.6, ['a.jpg'])
+
+
+def test_there_is_no_snapshot_without_a_search() -> None:
+    assert sessions.snapshot(UserData(), []) is None
+
+
+def test_unchanged_search_is_not_checkpointed_again(database) -> None:
+    UserData.all_users[CHAT_ID] = searching_user()
+    sessions.checkpoint(CHAT_ID)
+    sessions.flush()
+    assert CHAT_ID in saved_rows()
+
+    sessions.checkpoint(CHAT_ID)
+    assert not sessions.pending
+
+    UserData.all_users[CHAT_ID].minimum_price = 70
+    sessions.checkpoint(CHAT_ID)
+    assert CHAT_ID in sessions.pending
+
+
+def test_finished_search_is_deleted_and_forgotten(database) -> None:
+    user = UserData.all_users[CHAT_ID] = searching_user()
+    sessions.checkpoint(CHAT_ID)
+    sessions.flush()
+
+    user.current_command = None
+    sessions.checkpoint(CHAT_ID)
+    sessions.flush()
+    assert saved_rows() == dict()
+    assert CHAT_ID not in sessions.written
+
+    sessions.checkpoint(CHAT_ID)
+    assert not sessions.pending
+
+
+def test_failed_write_is_repeated_with_the_next_batch(database, monkeypatch) -> None:
+    user = UserData.all_users[CHAT_ID] = searching_user()
+    sessions.checkpoint(CHAT_ID)
+    sessions.flush()
+
+    user.current_command = None
+    sessions.checkpoint(CHAT_ID)
+    with monkeypatch.context() as patched:
+        patched.setattr(Session, 'delete', classmethod(broken_delete))
+        with pytest.raises(OSError):
+            sessions.flush()
+    assert sessions.pending == {CHAT_ID: None}
+    assert CHAT_ID in saved_rows()
+
+    sessions.flush()
+    assert saved_rows() == dict()
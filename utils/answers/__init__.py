@@ -1,2 +1,3 @@
 from . import answers_for_states
-from . import callbacks
\ No newline at end of file
+from . import callbacks
+from . import inline_queries
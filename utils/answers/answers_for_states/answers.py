@@ -1,10 +1,10 @@
 from re import fullmatch
 
-import emoji
 from telebot.types import Message
 
 import handlers.handlers_before_request.handlers as handlers
 import keyboards.inline.inline_keyboards as inline
+from keyboards.factory import MENU_TEXT
 from keyboards.reply.menu_button import menu_button
 from loader import my_bot
 from logger.logger import logger_wraps
@@ -20,7 +20,7 @@ def send_greeting(message: Message) -> None:
     :type message: Message object
     :return: None"""
 
-    if message.text == emoji.emojize('Меню   :desert_island:'):
+    if message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     elif message.text in ('привет'.lower(), 'привет'.upper(), 'привет'.capitalize()):
         my_bot.send_message(chat_id=message.chat.id,
@@ -45,7 +45,7 @@ def send_initial_answer(message: Message) -> None:
     :type message: Message object
     :return: None """
 
-    if message.text == emoji.emojize('Меню   :desert_island:'):
+    if message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     else:
         my_bot.send_message(chat_id=message.chat.id,
@@ -69,7 +69,7 @@ def send_middle_answer(message: Message) -> None:
     :type message: Message object
     :return: None"""
 
-    if message.text == emoji.emojize('Меню   :desert_island:'):
+    if message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     elif fullmatch(r'\d{1,2}.\d{1,2}.\d{4}', message.text):
         my_bot.send_message(chat_id=message.chat.id,
@@ -102,7 +102,7 @@ def send_next_middle_answer(message: Message) -> None:
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    if message.text == emoji.emojize('Меню   :desert_island:'):
+    if message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     elif message.text in ('да'.lower(), 'да'.upper(), 'да'.capitalize()):
         current_user.answer_about_photo = message.text
@@ -136,7 +136,7 @@ def send_last_answer(message: Message) -> None:
 
     current_user = UserData.get_user(message.chat.id)
 
-    if message.text == emoji.emojize('Меню   :desert_island:'):
+    if message.text == MENU_TEXT:
         inline.commands_keyboard(message)
     else:
         my_bot.send_message(chat_id=message.chat.id,
@@ -1,8 +1,11 @@
 from telebot.types import Message
 
+from database import destinations
 import handlers.default_handlers.handlers as commands
 import handlers.handlers_before_request.handlers as handlers
 import keyboards.inline.inline_keyboards as inline_keyboard
+from keyboards import callback_data as protocol
+from handlers.handlers_for_request_and_after.prefetch import cancel_prefetch
 from handlers.handlers_for_request_and_after.rapidapi import delete_showed_hotels
 from loader import my_bot
 from logger.logger import logger_wraps, logger
@@ -69,7 +72,7 @@ def history(message: Message, callback_id: int) -> None:
 def yes_button(message: Message, callback_id: int,
                callback_data: str) -> None:
     """Answering the callback after pressing 'yes' button (question about viewing photos),
-    displays the data of the pressed button, writes them to the corresponding field of the user
+    displays the data of the pressed button instead of the keyboard, writes them to the corresponding field of the user
     data class
 
     :param message: current message
@@ -82,7 +85,7 @@ def yes_button(message: Message, callback_id: int,
 
     current_user = UserData.get_user(message.chat.id)
     my_bot.answer_callback_query(callback_query_id=callback_id)
-    my_bot.send_message(chat_id=message.chat.id, text=callback_data)
+    handlers.replace_previous_message(message, text=callback_data)
     current_user.answer_about_photo = callback_data
     handlers.yes_answer_about_photo(message)
 
@@ -91,7 +94,7 @@ def yes_button(message: Message, callback_id: int,
 def no_button(message: Message, callback_id: int,
               callback_data: str) -> None:
     """Answering the callback after pressing the 'no' button (question about viewing a photo),
-    displays the data of the pressed button, writes them to the corresponding field of the user
+    displays the data of the pressed button instead of the keyboard, writes them to the corresponding field of the user
     data class
 
     :param message: current message
@@ -104,7 +107,7 @@ def no_button(message: Message, callback_id: int,
 
     current_user = UserData.get_user(message.chat.id)
     my_bot.answer_callback_query(callback_query_id=callback_id)
-    my_bot.send_message(chat_id=message.chat.id, text=callback_data)
+    handlers.replace_previous_message(message, text=callback_data)
     current_user.answer_about_photo = callback_data
     handlers.no_answer_about_photo(message)
 
@@ -114,7 +117,7 @@ def new_hotels(message: Message, callback_id: int,
                callback_data: str) -> None:
     """Answering the callback after pressing the 'new hotels' button, after the first
      display of the specified number of hotels, displays the data of the pressed
-     button, deletes the previous inline keyboard and calling the corresponding
+     button instead of the previous inline keyboard and calling the corresponding
     function that removes the shown hotels
 
     :param message: current message
@@ -126,8 +129,7 @@ def new_hotels(message: Message, callback_id: int,
     :return: None"""
 
     my_bot.answer_callback_query(callback_query_id=callback_id)
-    my_bot.send_message(chat_id=message.chat.id, text=callback_data)
-    handlers.delete_previous_message(message)
+    handlers.replace_previous_message(message, text=callback_data)
     delete_showed_hotels(message)
 
 
@@ -136,7 +138,7 @@ def new_search(message: Message, callback_id: int,
                callback_data: str) -> None:
     """Answering the callback after pressing the 'new search' button, after the first
     display of the specified number of hotels, displays the data of the pressed
-    button and calling list of available commands
+    button instead of the previous inline keyboard, cancels the prefetching of the next hotels and calling list of available commands
 
     :param message: current message
     :type message: Message object
@@ -147,7 +149,8 @@ def new_search(message: Message, callback_id: int,
     :return: None"""
 
     my_bot.answer_callback_query(callback_query_id=callback_id)
-    my_bot.send_message(chat_id=message.chat.id, text=callback_data)
+    handlers.replace_previous_message(message, text=callback_data)
+    cancel_prefetch(message)
     inline_keyboard.commands_keyboard(message)
 
 
@@ -156,9 +159,9 @@ def end_search(message: Message, callback_id: int,
                callback_data: str) -> None:
     """Answering the callback after pressing the 'end search' button, after the first
     displaying of the specified number of hotels, displays the data of the pressed
-    button, deletes the previous inline keyboard  and sends farewell message.
-    At the end, all dynamic attributes of the user data class are returned to the
-    default (initial) value
+    button instead of the previous inline keyboard and sends farewell message.
+    At the end, the prefetching of the next hotels is cancelled and all dynamic attributes
+    of the user data class are returned to the default (initial) value
 
     :param message: current message
     :type message: Message object
@@ -170,8 +173,7 @@ def end_search(message: Message, callback_id: int,
 
     current_user = UserData.get_user(message.chat.id)
     my_bot.answer_callback_query(callback_query_id=callback_id)
-    my_bot.send_message(chat_id=message.chat.id, text=callback_data)
-    handlers.delete_previous_message(message)
+    handlers.replace_previous_message(message, text=callback_data)
     my_bot.send_message(chat_id=message.chat.id,
                         text='*Спасибо, что выбрали меня. Обращайтесь снова*'
                              '* при любой необходимости)*',
@@ -183,26 +185,29 @@ def end_search(message: Message, callback_id: int,
 def show_hotels(message: Message, callback_id: int,
                 callback_data: str) -> None:
     """Answering the callback after pressing the button with selected city from the cities list,
-    displays the data of the pressed button, writes the destination id to the corresponding
-    dynamic attribute of the user data class, deletes the previous inline keyboard
+    displays the data of the pressed button instead of the previous inline keyboard, writes
+    the destination id to the corresponding dynamic attribute of the user data class
+    (the search in the destination is counted in the destination index). The city is taken
+    from the found cities list by its index, the button of the old list is only answered
 
     :param message: current message
     :type message: Message object
-    :param callback_data: data of pressed button
+    :param callback_data: argument of pressed button (index of the city and digest of the list)
     :type: callback_data: string
     :param callback_id: id of the callback of pressed button
     :type callback_id: integer
     :return: None"""
 
     current_user = UserData.get_user(message.chat.id)
-    for i_element in current_user.current_buffer:
-        for key, value in i_element.items():
-            if callback_data == value:
-                my_bot.answer_callback_query(callback_query_id=callback_id)
-                my_bot.send_message(chat_id=message.chat.id,
-                                    text=f'Хорошо, я запомню ваш выбор: {key}')
-                logger.info(f'{current_user.user_name} has selected {key}')
-                current_user.destination_id = value
-                handlers.delete_previous_message(message)
-                handlers.differance_between_commands(message)
-            break
+    choice = protocol.selected_city(callback_data, current_user.current_buffer)
+    if choice is None:
+        my_bot.answer_callback_query(callback_query_id=callback_id, text='Этот список городов устарел')
+        return
+    name, destination_id = choice
+    my_bot.answer_callback_query(callback_query_id=callback_id)
+    handlers.replace_previous_message(message,
+                                      text=f'Хорошо, я запомню ваш выбор: {name}')
+    logger.info(f'{current_user.user_name} has selected {name}')
+    current_user.destination_id = destination_id
+    destinations.select_destination(destination_id)
+    handlers.differance_between_commands(message)
@@ -0,0 +1,97 @@
+"""Answers to the inline queries (@bot москва).
+
+The cities are suggested from the destination index at once, while the user
+is typing, and Telegram caches the answer for INLINE_CACHE_TIME seconds. If
+nothing is found in the index, the API is requested in the background, but only
+for the text the user has stopped typing at (the query is not replaced by
+a newer one of the same user during INLINE_DEBOUNCE seconds)"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+import config
+import handlers.handlers_for_request_and_after.rapidapi as rapidapi
+from database import destinations
+from loader import my_bot
+from logger.logger import logger
+from utils import metrics
+
+inline_executor = ThreadPoolExecutor(max_workers=config.INLINE_WORKERS,
+                                     thread_name_prefix='inline')
+latest_queries: Dict[int, str] = dict()
+latest_lock = threading.Lock()
+
+
+def answer_query(query: InlineQuery) -> None:
+    """Answers the inline query with the cities from the destination index or, if there are
+    none, passes it to the background request of the API. Only the latest query of the user
+    waiting for the background request is remembered (the query answered from the index
+    cancels the waiting one)
+
+    :param: query: current inline query
+    :type: query: InlineQuery object
+    :return: None"""
+
+    found: List[Tuple[str, str]] = destinations.suggest(query.query)
+    if found or len(destinations.normalize(query.query)) < config.DESTINATIONS_MIN_QUERY:
+        with latest_lock:
+            latest_queries.pop(query.from_user.id, None)
+        metrics.increment('inline_index_answers')
+        send_results(query, found, cache_time=config.INLINE_CACHE_TIME)
+    else:
+        with latest_lock:
+            latest_queries[query.from_user.id] = query.id
+        inline_executor.submit(search_destinations, query)
+
+
+def search_destinations(query: InlineQuery) -> None:
+    """Requests the locations of the typed city, if the user has not typed anything else
+    during INLINE_DEBOUNCE seconds, and answers the query with them (the found locations are
+    added to the destination index, so the next queries are answered from it). It is executed
+    in the inline worker, whose result nobody waits for, so if something goes wrong, the error
+    is logged and the query is answered with no cities
+
+    :param: query: current inline query
+    :type: query: InlineQuery object
+    :return: None"""
+
+    time.sleep(config.INLINE_DEBOUNCE)
+    with latest_lock:
+        if latest_queries.get(query.from_user.id) != query.id:
+            metrics.increment('inline_debounced')
+            return
+        del latest_queries[query.from_user.id]
+    metrics.increment('inline_api_answers')
+    try:
+        rapidapi.fetch_locations(query.query, chat_id=query.from_user.id)
+        found: List[Tuple[str, str]] = destinations.suggest(query.query)
+    except Exception:
+        logger.exception('ups... the cities of the inline query are not found')
+        found = list()
+    send_results(query, found, cache_time=config.INLINE_MISS_CACHE_TIME)
+
+
+def send_results(query: InlineQuery, found: List[Tuple[str, str]], cache_time: int) -> None:
+    """Answers the inline query with the found cities, the selected city is sent to the chat
+    as the entered city
+
+    :param: query: current inline query
+    :type: query: InlineQuery object
+    :param: found: names and ids of the destinations
+    :type: found: list with the pairs of strings
+    :param: cache_time: seconds for which Telegram caches the answer
+    :type: cache_time: integer
+    :return: None"""
+
+    results = [InlineQueryResultArticle(id=source_id, title=name,
+                                        input_message_content=InputTextMessageContent(name))
+               for name, source_id in found]
+    try:
+        my_bot.answer_inline_query(query.id, results, cache_time=cache_time)
+    except ApiTelegramException:
+        logger.exception('ups... the inline query is not answered')
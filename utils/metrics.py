@@ -0,0 +1,77 @@
+"""In-process counters of the bot (Telegram and RapidAPI calls etc.).
+
+The counters are global and, if the chat id is given, also per chat.
+The per chat counters are read with chat and reset with pop_chat (e.g. the
+number of the Bot API calls per search, which are reset when the search starts)"""
+
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict
+
+counters: Counter = Counter()
+chat_counters: Dict[Any, Counter] = defaultdict(Counter)
+lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1, chat_id: Any = None) -> None:
+    """Increases the counter
+
+    :param: name: name of the counter
+    :type: name: string
+    :param: amount: the increase
+    :type: amount: integer
+    :param: chat_id: id of the chat, if the counter of the chat is also increased
+    :type: chat_id: integer or string
+    :return: None"""
+
+    with lock:
+        counters[name] += amount
+        if chat_id is not None:
+            chat_counters[chat_id][name] += amount
+
+
+def gauge(name: str, value: int) -> None:
+    """Sets the current value of the global counter (e.g. the remaining requests)
+
+    :param: name: name of the counter
+    :type: name: string
+    :param: value: the value
+    :type: value: integer
+    :return: None"""
+
+    with lock:
+        counters[name] = value
+
+
+def chat(chat_id: Any) -> Dict[str, int]:
+    """Returns the counters of the chat (they are not reset)
+
+    :param: chat_id: id of the chat
+    :type: chat_id: integer or string
+    :return: counters of the chat
+    :rtype: Dictionary[str, int]"""
+
+    with lock:
+        return dict(chat_counters.get(chat_id, Counter()))
+
+
+def pop_chat(chat_id: Any) -> Dict[str, int]:
+    """Returns the counters of the chat and resets them
+
+    :param: chat_id: id of the chat
+    :type: chat_id: integer or string
+    :return: counters of the chat
+    :rtype: Dictionary[str, int]"""
+
+    with lock:
+        return dict(chat_counters.pop(chat_id, Counter()))
+
+
+def snapshot() -> Dict[str, int]:
+    """Returns the current values of the global counters
+
+    :return: counters
+    :rtype: Dictionary[str, int]"""
+
+    with lock:
+        return dict(counters)
@@ -0,0 +1,209 @@
+"""Parsing of the RapidAPI responses.
+
+The payloads are decoded with msgspec or orjson (if one of them is installed),
+otherwise with the standard json module. With msgspec the hotels payloads are
+decoded directly into the schemas below, so only the fields used by the bot
+are ever created in memory"""
+
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+
+from models.hotel import Hotel
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+
+    class _Money(msgspec.Struct):
+        amount: Optional[float] = None
+
+    class _Price(msgspec.Struct):
+        lead: Optional[_Money] = None
+
+    class _Distance(msgspec.Struct):
+        value: Optional[float] = None
+
+    class _DestinationInfo(msgspec.Struct):
+        distanceFromDestination: Optional[_Distance] = None
+
+    class _Property(msgspec.Struct):
+        id: str
+        name: Optional[str] = None
+        price: Optional[_Price] = None
+        destinationInfo: Optional[_DestinationInfo] = None
+
+    class _PropertySearch(msgspec.Struct):
+        properties: Optional[List[_Property]] = None
+
+    class _PropertiesData(msgspec.Struct):
+        propertySearch: Optional[_PropertySearch] = None
+
+    class _PropertiesPayload(msgspec.Struct):
+        data: Optional[_PropertiesData] = None
+
+    class _Address(msgspec.Struct):
+        addressLine: Optional[str] = None
+
+    class _Location(msgspec.Struct):
+        address: Optional[_Address] = None
+
+    class _Rating(msgspec.Struct):
+        rating: Optional[float] = None
+
+    class _Overview(msgspec.Struct):
+        propertyRating: Optional[_Rating] = None
+
+    class _Summary(msgspec.Struct):
+        location: Optional[_Location] = None
+        overview: Optional[_Overview] = None
+
+    class _Image(msgspec.Struct):
+        url: Optional[str] = None
+
+    class _GalleryImage(msgspec.Struct):
+        image: Optional[_Image] = None
+
+    class _Gallery(msgspec.Struct):
+        images: Optional[List[_GalleryImage]] = None
+
+    class _PropertyInfo(msgspec.Struct):
+        summary: Optional[_Summary] = None
+        propertyGallery: Optional[_Gallery] = None
+
+    class _SummaryData(msgspec.Struct):
+        propertyInfo: Optional[_PropertyInfo] = None
+
+    class _SummaryPayload(msgspec.Struct):
+        data: Optional[_SummaryData] = None
+
+    _properties_decoder = msgspec.json.Decoder(_PropertiesPayload)
+    _summary_decoder = msgspec.json.Decoder(_SummaryPayload)
+
+
+def decode(content: Union[bytes, str]) -> Any:
+    """Decodes the body of the API response with the fastest available decoder
+
+    :param: content: body of the response
+    :type: content: bytes or string
+    :return: decoded data
+    :rtype: Any"""
+
+    if orjson is not None:
+        return orjson.loads(content)
+    if msgspec is not None:
+        return msgspec.json.decode(content)
+    return json.loads(content)
+
+
+def dig(data: Any, *keys: str, default: Any = None) -> Any:
+    """Returns the value of the nested dictionaries by the chain of keys or the default value,
+    if any of the keys is missing or any of the intermediate values is not a dictionary
+    (e.g. null in the API response)
+
+    :param: data: decoded data
+    :type: data: Any
+    :param: keys: chain of keys
+    :type: keys: strings
+    :param: default: value returned if the chain is broken
+    :type: default: Any
+    :return: the found value
+    :rtype: Any"""
+
+    for key in keys:
+        if not isinstance(data, dict):
+            return default
+        data = data.get(key)
+    return default if data is None else data
+
+
+def _projected(value: Any, *attributes: str, default: Any = None) -> Any:
+    """The same as dig, but for the chain of attributes of the decoded msgspec schemas"""
+
+    for attribute in attributes:
+        if value is None:
+            return default
+        value = getattr(value, attribute)
+    return default if value is None else value
+
+
+def parse_properties(content: Union[bytes, str]) -> 'OrderedDict[str, Hotel]':
+    """Parses the response of the /properties/v2/list endpoint into the hotel records
+    (in the same order as they were received)
+
+    :param: content: body of the response
+    :type: content: bytes or string
+    :return: hotel records by their ids
+    :rtype: OrderedDict[str, Hotel]"""
+
+    hotels: OrderedDict[str, Hotel] = OrderedDict()
+    if msgspec is not None:
+        try:
+            payload = _properties_decoder.decode(content)
+        except msgspec.ValidationError:
+            pass
+        else:
+            for item in _projected(payload, 'data', 'propertySearch', 'properties', default=[]):
+                hotels[item.id] = Hotel(
+                    hotel_id=item.id,
+                    name=item.name or '',
+                    price=_projected(item, 'price', 'lead', 'amount', default=0),
+                    remoteness=_projected(item, 'destinationInfo', 'distanceFromDestination',
+                                          'value', default=0)
+                )
+            return hotels
+
+    for item in dig(decode(content), 'data', 'propertySearch', 'properties', default=[]):
+        hotel_id = item.get('id')
+        if hotel_id is None:
+            continue
+        hotel_id = str(hotel_id)
+        hotels[hotel_id] = Hotel(
+            hotel_id=hotel_id,
+            name=item.get('name') or '',
+            price=dig(item, 'price', 'lead', 'amount', default=0),
+            remoteness=dig(item, 'destinationInfo', 'distanceFromDestination', 'value', default=0)
+        )
+    return hotels
+
+
+def parse_summary(content: Union[bytes, str], hotel: Hotel) -> Hotel:
+    """Parses the response of the /properties/v2/get-summary endpoint and adds the address,
+    rating and photos urls to the hotel record
+
+    :param: content: body of the response
+    :type: content: bytes or string
+    :param: hotel: record of the hotel
+    :type: hotel: Hotel
+    :return: the same record of the hotel
+    :rtype: Hotel"""
+
+    if msgspec is not None:
+        try:
+            payload = _summary_decoder.decode(content)
+        except msgspec.ValidationError:
+            pass
+        else:
+            info = _projected(payload, 'data', 'propertyInfo')
+            hotel.address = _projected(info, 'summary', 'location', 'address', 'addressLine')
+            hotel.rating = _projected(info, 'summary', 'overview', 'propertyRating', 'rating')
+            hotel.images = [image.image.url for image in _projected(
+                info, 'propertyGallery', 'images', default=[])
+                            if image.image is not None and image.image.url]
+            return hotel
+
+    info: Dict[str, Any] = dig(decode(content), 'data', 'propertyInfo', default={})
+    hotel.address = dig(info, 'summary', 'location', 'address', 'addressLine')
+    hotel.rating = dig(info, 'summary', 'overview', 'propertyRating', 'rating')
+    hotel.images = [url for url in (dig(image, 'image', 'url') for image in dig(
+        info, 'propertyGallery', 'images', default=[])) if url]
+    return hotel
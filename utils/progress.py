@@ -0,0 +1,158 @@
+"""Progress message of the search.
+
+Instead of sending a waiting message and deleting it afterwards, one message
+is sent when the request starts, its text is edited in place as the stages
+finish, and at the end it becomes the message with the result (e.g. the
+keyboard with the found cities), so the result costs no extra call"""
+
+import time
+from typing import Optional, Union
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup, Message
+
+import config
+from loader import my_bot
+from logger.logger import logger_wraps, logger
+from models.data_class import UserData
+from utils.rate_limiter import QueuedCall
+
+
+class ProgressMessage:
+    """The message, which shows the current stage of the search
+
+    :param: chat_id: id of the user's chat
+    :type: chat_id: integer
+    :param: message_id: id of the sent message
+    :type: message_id: integer
+    :param: text: current text of the message
+    :type: text: string
+    :param: updated: the moment of the last edit (time.monotonic)
+    :type: updated: float"""
+
+    def __init__(self, chat_id: int, message_id: int, text: str):
+        self.chat_id: int = chat_id
+        self.message_id: int = message_id
+        self.text: str = text
+        self.updated: float = time.monotonic()
+
+    def edit(self, text: str, reply_markup: Union[InlineKeyboardMarkup, str, None] = None,
+             **kwargs) -> QueuedCall:
+        """Replaces the text (and the keyboard) of the message
+
+        :param: text: new text
+        :type: text: string
+        :param: reply_markup: new keyboard
+        :type: reply_markup: InlineKeyboardMarkup or string (serialized keyboard)
+        :return: the queued edit (its result is the edited message)
+        :rtype: QueuedCall"""
+
+        result = my_bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id,
+                                          reply_markup=reply_markup, parse_mode='Markdown', **kwargs)
+        self.text = text
+        self.updated = time.monotonic()
+        return result
+
+
+@logger_wraps()
+def start(message: Message, text: str) -> None:
+    """Sends the progress message of the user's search (the previous one is forgotten)
+
+    :param message: current message
+    :type message: Message object
+    :param: text: the first stage of the search
+    :type: text: string
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    result = my_bot.send_message(chat_id=message.chat.id, text=text, parse_mode='Markdown').result()
+    current_user.progress_message = ProgressMessage(message.chat.id, result.message_id, text)
+
+
+def update(message: Message, text: str, force: bool = False) -> None:
+    """Shows the new stage of the search in the progress message. The edits are made
+    not more often than once in PROGRESS_INTERVAL seconds (the skipped stages are not shown),
+    unless they are forced
+
+    :param message: current message
+    :type message: Message object
+    :param: text: the stage of the search
+    :type: text: string
+    :param: force: edit regardless of the interval
+    :type: force: bool
+    :return: None"""
+
+    progress: Optional[ProgressMessage] = UserData.get_user(message.chat.id).progress_message
+    if progress is None or progress.text == text:
+        return
+    if not force and time.monotonic() - progress.updated < config.PROGRESS_INTERVAL:
+        return
+    # the failed edit is only logged by the scheduler
+    progress.edit(text)
+
+
+def deliver(message: Message, text: str, reply_markup: Union[InlineKeyboardMarkup, str, None] = None,
+            **kwargs) -> Message:
+    """Shows the result in the progress message, which is then forgotten. If there is no progress
+    message (or it could not be edited), the result is sent as a new message
+
+    :param message: current message
+    :type message: Message object
+    :param: text: text of the result
+    :type: text: string
+    :param: reply_markup: keyboard of the result
+    :type: reply_markup: InlineKeyboardMarkup or string (serialized keyboard)
+    :return: message with the result
+    :rtype: Message object"""
+
+    current_user = UserData.get_user(message.chat.id)
+    progress: Optional[ProgressMessage] = current_user.progress_message
+    current_user.progress_message = None
+    if progress is not None:
+        try:
+            result = progress.edit(text, reply_markup=reply_markup, **kwargs).result()
+            if isinstance(result, Message):
+                return result
+        except ApiTelegramException:
+            logger.exception('ups... the progress message is not edited')
+            close_message(progress)
+    return my_bot.send_message(chat_id=message.chat.id, text=text, reply_markup=reply_markup,
+                               parse_mode='Markdown', **kwargs).result()
+
+
+@logger_wraps()
+def release(message: Message, text: Optional[str] = None) -> None:
+    """Leaves the progress message in the chat with the final text (e.g. above the sent photos)
+    and forgets it, so the result is sent as a new message
+
+    :param message: current message
+    :type message: Message object
+    :param: text: the final text
+    :type: text: string
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    if text is not None:
+        update(message, text, force=True)
+    current_user.progress_message = None
+
+
+@logger_wraps()
+def close(message: Message) -> None:
+    """Deletes the progress message, which has not become the result (e.g. the request failed)
+
+    :param message: current message
+    :type message: Message object
+    :return: None"""
+
+    current_user = UserData.get_user(message.chat.id)
+    progress: Optional[ProgressMessage] = current_user.progress_message
+    current_user.progress_message = None
+    if progress is not None:
+        close_message(progress)
+
+
+def close_message(progress: ProgressMessage) -> None:
+    """Deletes the progress message from the chat (the failed deletion is only logged by the scheduler)"""
+
+    my_bot.delete_message(chat_id=progress.chat_id, message_id=progress.message_id)
@@ -0,0 +1,151 @@
+"""Budget of the RapidAPI requests.
+
+Every request (every attempt of the retry layer) takes one request from the
+minute and the daily budgets and from the daily budget of the user. The
+background requests (prefetched summaries, speculative hotels lists) are
+allowed only while more than QUOTA_RESERVE of the budgets is left, so the
+rest of the day is kept for the requests the users are waiting for. The
+remaining requests reported by RapidAPI in the rate limit headers of the
+responses are taken into account as well"""
+
+import threading
+import time
+from collections import Counter
+from datetime import date
+from typing import Any, Optional
+
+from requests.exceptions import RequestException
+from requests.models import Response
+
+import config
+from logger.logger import logger
+from utils import metrics
+
+
+class QuotaExceeded(RequestException):
+    """The request is not made, because the budget is spent"""
+
+
+class Quota:
+    """Counters of the spent requests
+
+    :param: day: the day of the daily counters
+    :type: day: date object
+    :param: day_count: requests made during the day
+    :type: day_count: integer
+    :param: minute_started: the start of the current minute window (time.monotonic)
+    :type: minute_started: float
+    :param: minute_count: requests made during the minute window
+    :type: minute_count: integer
+    :param: users: requests made during the day by the users (by chat ids)
+    :type: users: Counter
+    :param: upstream_remaining: remaining requests reported by RapidAPI (None if unknown)
+    :type: upstream_remaining: integer
+    :param: upstream_reset: the moment when the reported remaining requests are reset (time.monotonic)
+    :type: upstream_reset: float"""
+
+    def __init__(self):
+        self.day: date = date.today()
+        self.day_count: int = 0
+        self.minute_started: float = time.monotonic()
+        self.minute_count: int = 0
+        self.users: Counter = Counter()
+        self.upstream_remaining: Optional[int] = None
+        self.upstream_reset: float = 0
+        self.lock = threading.Lock()
+
+    def roll(self, now: float) -> None:
+        """Starts the new windows, if the current ones are over"""
+
+        if now - self.minute_started >= 60:
+            self.minute_started = now
+            self.minute_count = 0
+        if date.today() != self.day:
+            self.day = date.today()
+            self.day_count = 0
+            self.users.clear()
+        if self.upstream_remaining is not None and now >= self.upstream_reset:
+            self.upstream_remaining = None
+
+    def remaining(self) -> int:
+        """Returns the requests left for the day"""
+
+        remaining: int = config.QUOTA_DAILY - self.day_count
+        if self.upstream_remaining is not None:
+            remaining = min(remaining, self.upstream_remaining)
+        return remaining
+
+
+quota = Quota()
+
+
+def acquire(endpoint: str, chat_id: Any = None, background: bool = False) -> None:
+    """Takes one request from the budgets
+
+    :param: endpoint: name of the endpoint
+    :type: endpoint: string
+    :param: chat_id: id of the user's chat, who the request is made for
+    :type: chat_id: integer
+    :param: background: the request is not awaited by the user (it is made only within the reserve)
+    :type: background: bool
+    :return: None
+    :raises: QuotaExceeded: if the budget is spent"""
+
+    with quota.lock:
+        quota.roll(time.monotonic())
+        day_left: int = quota.remaining()
+        minute_left: int = config.QUOTA_PER_MINUTE - quota.minute_count
+        if background:
+            allowed = (day_left > config.QUOTA_DAILY * config.QUOTA_RESERVE and
+                       minute_left > config.QUOTA_PER_MINUTE * config.QUOTA_RESERVE)
+        else:
+            allowed = (day_left > 0 and minute_left > 0 and
+                       (chat_id is None or quota.users[chat_id] < config.QUOTA_USER_DAILY))
+        if allowed:
+            quota.day_count += 1
+            quota.minute_count += 1
+            if quota.upstream_remaining is not None:
+                quota.upstream_remaining -= 1
+            if chat_id is not None:
+                quota.users[chat_id] += 1
+    if not allowed:
+        metrics.increment('rapidapi_background_deferred' if background else 'rapidapi_quota_rejected')
+        raise QuotaExceeded(f'{endpoint} request is over the budget '
+                            f'({day_left} left for the day, {minute_left} for the minute)')
+    metrics.increment(f'rapidapi_{endpoint}_requests', chat_id=chat_id)
+    metrics.gauge('rapidapi_quota_remaining', day_left - 1)
+
+
+def available(background: bool = True) -> bool:
+    """Returns whether the request can be made now (without taking it from the budgets),
+    e.g. the background requests are not started when only the reserve is left
+
+    :param: background: the request is not awaited by the user
+    :type: background: bool
+    :return: True, if the request fits the budgets
+    :rtype: bool"""
+
+    reserve: float = config.QUOTA_RESERVE if background else 0
+    with quota.lock:
+        quota.roll(time.monotonic())
+        return (quota.remaining() > config.QUOTA_DAILY * reserve and
+                config.QUOTA_PER_MINUTE - quota.minute_count > config.QUOTA_PER_MINUTE * reserve)
+
+
+def record(response: Response) -> None:
+    """Remembers the remaining requests reported by RapidAPI in the rate limit headers
+
+    :param: response: response from the endpoint
+    :type: response: Response object
+    :return: None"""
+
+    remaining: Optional[str] = response.headers.get('X-RateLimit-Requests-Remaining')
+    if remaining is None or not remaining.isdigit():
+        return
+    reset: str = response.headers.get('X-RateLimit-Requests-Reset', '')
+    with quota.lock:
+        quota.upstream_remaining = int(remaining)
+        quota.upstream_reset = time.monotonic() + (int(reset) if reset.isdigit() else 24 * 3600)
+    metrics.gauge('rapidapi_upstream_remaining', int(remaining))
+    if int(remaining) <= config.QUOTA_DAILY * config.QUOTA_RESERVE:
+        logger.warning(f'only {remaining} RapidAPI requests are left')
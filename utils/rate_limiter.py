@@ -0,0 +1,320 @@
+"""Outbound scheduler of the Telegram Bot API calls.
+
+The calls of the bot are not made by the handler threads: they are put in the
+queue of their chat and the handler gets a QueuedCall (a future of the result)
+at once, so a chat which has spent its tokens does not stall the updates of the
+other chats. The dispatcher thread releases the calls whenever the bucket of the
+chat and the global bucket have tokens: the calls of one chat are made one by one
+in the order of their arrival, the chats compete by the priority of their first
+call (keyboards first, decorative messages last) and, within one priority, by
+its arrival. If Telegram still answers with 429, the chat (or the whole bot)
+waits for retry_after seconds and the call is repeated"""
+
+import itertools
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+from logger.logger import logger
+from utils import metrics
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+LOW_PRIORITY = 2
+# the key of the whole bot in blocked_until (None is the key of the edits of the inline messages)
+GLOBAL = object()
+
+
+class TokenBucket:
+    """Token bucket, which is refilled with the given rate up to its capacity
+
+    :param: rate: number of tokens added per second
+    :type: rate: float
+    :param: capacity: maximum number of tokens (the size of the burst)
+    :type: capacity: float
+    :param: tokens: current number of tokens
+    :type: tokens: float
+    :param: updated: the moment of the last refill (time.monotonic)
+    :type: updated: float"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Adds the tokens accumulated since the last refill"""
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Returns the number of seconds until the token is available (0 if it is available now)"""
+
+        self.refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        """Takes one token"""
+
+        self.refill(now)
+        self.tokens -= 1
+
+
+class QueuedCall(Future):
+    """Call of the bot method waiting in the queue of its chat (the future of its result)
+
+    :param: chat_id: id of the chat
+    :type: chat_id: integer or string
+    :param: ticket: priority of the call and the number of its arrival
+    :type: ticket: tuple with integers
+    :param: function: the called method of the bot
+    :type: function: Callable
+    :param: retries: number of the calls repeated after the 429 answer
+    :type: retries: integer"""
+
+    def __init__(self, chat_id: Any, ticket: Tuple[int, int], function: Callable,
+                 args: tuple, kwargs: Dict[str, Any]):
+        super().__init__()
+        self.chat_id: Any = chat_id
+        self.ticket: Tuple[int, int] = ticket
+        self.function: Callable = function
+        self.args: tuple = args
+        self.kwargs: Dict[str, Any] = kwargs
+        self.retries: int = 0
+
+    def __deepcopy__(self, memo):
+        # the queued call is the handle of the call in the queue, its copy would never be finished
+        return self
+
+
+class OutboundScheduler:
+    """Scheduler, which limits the rate of the calls per chat and globally
+
+    :param: global_bucket: bucket shared by all the chats
+    :type: global_bucket: TokenBucket
+    :param: chat_buckets: buckets of the recently called chats (at most max_chats of them,
+    the least recently used ones are forgotten first)
+    :type: chat_buckets: OrderedDict with chat ids as keys
+    :param: queues: waiting calls of the chats
+    :type: queues: dictionary with chat ids as keys and deques of QueuedCall as values
+    :param: busy: the chats, whose call is being made
+    :type: busy: set with chat ids
+    :param: blocked_until: the moments until which the chats (and the whole bot
+    with the GLOBAL key) are blocked after the 429 answer
+    :type: blocked_until: dictionary with chat ids as keys and floats as values
+    :param: executor: threads, which make the released calls
+    :type: executor: ThreadPoolExecutor"""
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float,
+                 max_retries: int = 3, workers: int = 4, max_chats: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate: float = chat_rate
+        self.chat_burst: float = chat_burst
+        self.max_retries: int = max_retries
+        self.max_chats: int = max_chats
+        self.chat_buckets: OrderedDict[Any, TokenBucket] = OrderedDict()
+        self.queues: Dict[Any, Deque[QueuedCall]] = dict()
+        self.busy: Set[Any] = set()
+        self.blocked_until: Dict[Any, float] = dict()
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='telegram')
+        self.dispatcher: Optional[threading.Thread] = None
+
+    def submit(self, chat_id: Any, priority: int, function: Callable, *args, **kwargs) -> QueuedCall:
+        """Puts the call in the queue of the chat and returns it at once
+
+        :param: chat_id: id of the chat
+        :type: chat_id: integer or string
+        :param: priority: priority of the call (the lower, the earlier)
+        :type: priority: integer
+        :param: function: the called method of the bot
+        :type: function: Callable
+        :return: the queued call (its result() waits for the result of the call)
+        :rtype: QueuedCall"""
+
+        call = QueuedCall(chat_id, (priority, next(self.counter)), function, args, kwargs)
+        with self.condition:
+            self.queues.setdefault(chat_id, deque()).append(call)
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self.dispatch, name='outbound', daemon=True)
+                self.dispatcher.start()
+            self.condition.notify_all()
+        return call
+
+    def call(self, chat_id: Any, priority: int, function: Callable, *args, **kwargs) -> Any:
+        """Makes the call through the queue and waits for its result"""
+
+        return self.submit(chat_id, priority, function, *args, **kwargs).result()
+
+    def dispatch(self) -> None:
+        """Loop of the dispatcher thread: takes the tokens for the next ready call
+        and passes it to the executor"""
+
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                call, delay = self.next_call(now)
+                if call is None:
+                    self.condition.wait(timeout=delay)
+                    continue
+                queue = self.queues[call.chat_id]
+                queue.popleft()
+                if not queue:
+                    del self.queues[call.chat_id]
+                self.busy.add(call.chat_id)
+                self.global_bucket.take(now)
+                self.chat_bucket(call.chat_id).take(now)
+            self.executor.submit(self.make, call)
+
+    def next_call(self, now: float) -> Tuple[Optional[QueuedCall], Optional[float]]:
+        """Returns the first call of the chats, which is ready to be made, with the highest
+        priority (or with the same priority, but which has arrived earlier). If there is
+        no such call, returns the number of seconds until one of the calls is allowed
+        (None, if all the chats are waiting for their calls being made)"""
+
+        ready: Optional[QueuedCall] = None
+        delay: Optional[float] = None
+        for chat_id, queue in self.queues.items():
+            if chat_id in self.busy:
+                continue
+            wait: float = self.delay(chat_id, now)
+            if wait > 0:
+                delay = wait if delay is None else min(delay, wait)
+            elif ready is None or queue[0].ticket < ready.ticket:
+                ready = queue[0]
+        return ready, delay
+
+    def make(self, call: QueuedCall) -> None:
+        """Makes the call in the executor thread. The call answered with 429
+        is put back at the head of the queue of its chat (no more than max_retries times)"""
+
+        try:
+            result: Any = call.function(*call.args, **call.kwargs)
+        except ApiTelegramException as error:
+            if error.error_code == 429 and call.retries < self.max_retries:
+                call.retries += 1
+                retry_after: float = (error.result_json.get('parameters') or dict()).get('retry_after', 1)
+                logger.warning(f'flood limit in the chat {call.chat_id}, retry after {retry_after} s')
+                self.release(call.chat_id, retry_after=retry_after, repeated=call)
+                return
+            self.fail(call, error)
+        except Exception as error:
+            self.fail(call, error)
+        else:
+            self.release(call.chat_id)
+            call.set_result(result)
+
+    def fail(self, call: QueuedCall, error: Exception) -> None:
+        """Finishes the failed call (the error is raised by its result())"""
+
+        logger.warning(f'the call {call.function.__name__} to the chat {call.chat_id} has failed: {error}')
+        self.release(call.chat_id)
+        call.set_exception(error)
+
+    def release(self, chat_id: Any, retry_after: float = 0, repeated: Optional[QueuedCall] = None) -> None:
+        """Allows the next call of the chat. After the 429 answer the chat is blocked for
+        the given number of seconds and the repeated call is put back at the head of its queue"""
+
+        with self.condition:
+            self.busy.discard(chat_id)
+            if repeated is not None:
+                self.queues.setdefault(chat_id, deque()).appendleft(repeated)
+            if retry_after > 0:
+                self.block(chat_id, retry_after)
+            self.condition.notify_all()
+
+    def block(self, chat_id: Any, retry_after: float) -> None:
+        """Blocks the calls to the chat for the given number of seconds (the expired blocks
+        are forgotten). It is called under the condition"""
+
+        now: float = time.monotonic()
+        for blocked in [key for key, until in self.blocked_until.items() if until <= now]:
+            del self.blocked_until[blocked]
+        self.blocked_until[chat_id] = max(self.blocked_until.get(chat_id, 0), now + retry_after)
+
+    def chat_bucket(self, chat_id: Any) -> TokenBucket:
+        """Returns the bucket of the chat (a new one is created on the first call,
+        the least recently used one is forgotten, if there are more than max_chats buckets)"""
+
+        bucket: Optional[TokenBucket] = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self.chat_buckets) > self.max_chats:
+                self.chat_buckets.popitem(last=False)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def delay(self, chat_id: Any, now: float) -> float:
+        """Returns the number of seconds until the call to the chat is allowed"""
+
+        return max(self.global_bucket.delay(now),
+                   self.chat_bucket(chat_id).delay(now),
+                   self.blocked_until.get(GLOBAL, 0) - now,
+                   self.blocked_until.get(chat_id, 0) - now)
+
+
+class ScheduledTeleBot(TeleBot):
+    """Telegram bot, which sends, edits and deletes messages through the outbound scheduler.
+    The methods return the queued calls at once: the caller waits only if it needs the result
+    (e.g. the id of the sent message) or handles the errors of the call (the errors of the calls,
+    whose result is not waited for, are only logged). The messages with keyboards have the high priority,
+    animations have the low one. The priority can also be set by the additional keyword argument 'priority'
+
+    :param: scheduler: outbound scheduler of the calls
+    :type: scheduler: OutboundScheduler"""
+
+    def __init__(self, *args, scheduler: OutboundScheduler, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler: OutboundScheduler = scheduler
+
+    def scheduled(self, chat_id: Any, priority: Optional[int], function: Callable,
+                  *args, **kwargs) -> QueuedCall:
+        """Puts the call of the bot method in the queue of the scheduler (the calls are counted
+        in the telegram_calls metric)"""
+
+        metrics.increment('telegram_calls', chat_id=chat_id)
+        if priority is None:
+            priority = HIGH_PRIORITY if kwargs.get('reply_markup') is not None else NORMAL_PRIORITY
+        return self.scheduler.submit(chat_id, priority, function, *args, **kwargs)
+
+    def register_next_step_handler(self, message, callback, *args, **kwargs):
+        # the chat of the queued message is known before it is sent
+        if isinstance(message, QueuedCall):
+            return self.register_next_step_handler_by_chat_id(message.chat_id, callback, *args, **kwargs)
+        return super().register_next_step_handler(message, callback, *args, **kwargs)
+
+    def send_message(self, chat_id, text, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().send_message, chat_id, text, *args, **kwargs)
+
+    def send_animation(self, chat_id, animation, *args, priority: Optional[int] = LOW_PRIORITY, **kwargs):
+        return self.scheduled(chat_id, priority, super().send_animation, chat_id, animation, *args, **kwargs)
+
+    def send_video(self, chat_id, video, *args, priority: Optional[int] = LOW_PRIORITY, **kwargs):
+        return self.scheduled(chat_id, priority, super().send_video, chat_id, video, *args, **kwargs)
+
+    def send_media_group(self, chat_id, media, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().send_media_group, chat_id, media, *args, **kwargs)
+
+    def send_document(self, chat_id, document, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().send_document, chat_id, document, *args, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().edit_message_text, text, chat_id, *args, **kwargs)
+
+    def edit_message_caption(self, caption, chat_id=None, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().edit_message_caption, caption, chat_id, *args, **kwargs)
+
+    def edit_message_reply_markup(self, chat_id=None, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().edit_message_reply_markup, chat_id, *args, **kwargs)
+
+    def delete_message(self, chat_id, message_id, *args, priority: Optional[int] = None, **kwargs):
+        return self.scheduled(chat_id, priority, super().delete_message, chat_id, message_id, *args, **kwargs)
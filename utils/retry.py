@@ -0,0 +1,241 @@
+"""Retries of the RapidAPI requests.
+
+Every endpoint has its own timeout and circuit breaker. A failed request
+(timeout, connection error, 429 or 5xx answer) is repeated a limited number
+of times with the exponentially growing pause with jitter; the requests to
+the non-idempotent endpoints are repeated only if they have not reached the
+server. After BREAKER_THRESHOLD failures in a row the breaker opens and the
+requests to the endpoint fail at once (the last successful response of the
+same request is returned, if there is one) until BREAKER_RESET_TIMEOUT
+passes and a trial request succeeds, so the handler threads do not wait for
+the upstream during the outage"""
+
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+import config
+from logger.logger import logger
+from utils import metrics, quota
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+UNPROCESSED_STATUSES = frozenset({429, 503})
+
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """The request has failed (or has not been made, because the breaker is open)
+    and there is no saved response to return instead"""
+
+
+class CircuitBreaker:
+    """Circuit breaker of the endpoint
+
+    :param: threshold: number of the failures in a row, which opens the breaker
+    :type: threshold: integer
+    :param: reset_timeout: seconds after which the trial request is allowed
+    :type: reset_timeout: float
+    :param: failures: current number of the failures in a row
+    :type: failures: integer
+    :param: opened: the moment when the breaker was opened (time.monotonic, None if it is closed)
+    :type: opened: float
+    :param: trial: the trial request is being made
+    :type: trial: bool"""
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold: int = threshold
+        self.reset_timeout: float = reset_timeout
+        self.failures: int = 0
+        self.opened: Optional[float] = None
+        self.trial: bool = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Returns whether the request can be made (only one trial request is allowed
+        after the reset timeout of the opened breaker)"""
+
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.trial or time.monotonic() - self.opened < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def cancel(self) -> None:
+        """Gives back the trial request, which has not been made (e.g. the budget is spent),
+        so the next request can become the trial one"""
+
+        with self.lock:
+            self.trial = False
+
+    def success(self) -> None:
+        """Closes the breaker"""
+
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.trial = False
+
+    def failure(self) -> None:
+        """Counts the failure and opens the breaker, if there are too many of them
+        (or the trial request has failed)"""
+
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                if self.opened is None or self.trial:
+                    logger.warning(f'the circuit breaker is opened after {self.failures} failures')
+                self.opened = time.monotonic()
+                self.trial = False
+
+
+class Endpoint:
+    """The RapidAPI endpoint
+
+    :param: name: name of the endpoint (for the metrics)
+    :type: name: string
+    :param: timeout: timeout of the request in seconds
+    :type: timeout: float
+    :param: idempotent: the request can be repeated even if it has reached the server
+    :type: idempotent: bool
+    :param: breaker: circuit breaker of the endpoint
+    :type: breaker: CircuitBreaker"""
+
+    def __init__(self, name: str, timeout: float, idempotent: bool = True):
+        self.name: str = name
+        self.timeout: float = timeout
+        self.idempotent: bool = idempotent
+        self.breaker = CircuitBreaker(config.BREAKER_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+
+
+# all the endpoints only search, so repeating them is safe
+ENDPOINTS: Dict[str, Endpoint] = {
+    'locations': Endpoint('locations', config.LOCATIONS_TIMEOUT),
+    'properties': Endpoint('properties', config.PROPERTIES_TIMEOUT),
+    'summary': Endpoint('summary', config.SUMMARY_TIMEOUT)
+}
+# one session for all the RapidAPI requests: the connections to the host are kept alive
+# and shared by the worker threads, so the requests of a page do not open a new
+# TLS connection each. The pool keeps a connection for every thread, which makes
+# the requests: the handler threads of the bot, the summary, prefetch and inline workers
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=config.BOT_THREADS + config.SUMMARY_WORKERS
+                                      + config.PREFETCH_WORKERS + config.INLINE_WORKERS))
+responses: 'OrderedDict[str, Response]' = OrderedDict()
+responses_lock = threading.Lock()
+
+
+def request(endpoint_name: str, method: str, url: str, chat_id: Any = None,
+            background: bool = False, **kwargs) -> Response:
+    """Makes the request to the endpoint with retries (every attempt is taken from the request
+    budgets). If the request has failed, the last successful response of the same request
+    is returned, otherwise the last failed response (e.g. 404 is returned at once)
+
+    :param: endpoint_name: name of the endpoint
+    :type: endpoint_name: string
+    :param: method: HTTP method
+    :type: method: string
+    :param: url: url of the endpoint
+    :type: url: string
+    :param: chat_id: id of the user's chat, who the request is made for
+    :type: chat_id: integer
+    :param: background: the request is not awaited by the user (e.g. prefetch)
+    :type: background: bool
+    :param: kwargs: arguments of requests.request (headers, params, json)
+    :return: response from the endpoint
+    :rtype: Response object
+    :raises: QuotaExceeded: if the budget is spent and there is no saved response
+    :raises: UpstreamUnavailable: if the request has failed and there is no saved response"""
+
+    endpoint: Endpoint = ENDPOINTS[endpoint_name]
+    key: str = request_key(method, url, kwargs)
+    failure: Union[Response, Exception, None] = None
+    for attempt in range(1, config.RETRY_ATTEMPTS + 1):
+        if not endpoint.breaker.allow():
+            metrics.increment(f'rapidapi_{endpoint.name}_short_circuited')
+            break
+        try:
+            quota.acquire(endpoint.name, chat_id=chat_id, background=background)
+        except quota.QuotaExceeded as error:
+            endpoint.breaker.cancel()
+            failure = error
+            break
+        if attempt > 1:
+            metrics.increment(f'rapidapi_{endpoint.name}_retries')
+        try:
+            response: Response = session.request(method, url, timeout=endpoint.timeout, **kwargs)
+            quota.record(response)
+        except requests.exceptions.RequestException as error:
+            endpoint.breaker.failure()
+            failure = error
+            repeatable = endpoint.idempotent or isinstance(error, requests.exceptions.ConnectTimeout)
+            if not isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                break
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                endpoint.breaker.success()
+                if response.status_code == requests.codes.ok:
+                    save_response(key, response)
+                return response
+            endpoint.breaker.failure()
+            failure = response
+            repeatable = endpoint.idempotent or response.status_code in UNPROCESSED_STATUSES
+        if not repeatable or attempt == config.RETRY_ATTEMPTS:
+            break
+        time.sleep(backoff(attempt, failure))
+
+    with responses_lock:
+        saved: Optional[Response] = responses.get(key)
+    if saved is not None:
+        metrics.increment(f'rapidapi_{endpoint.name}_saved_responses')
+        logger.warning(f'{endpoint.name} request has failed, the saved response is returned')
+        return saved
+    if isinstance(failure, Response):
+        return failure
+    if isinstance(failure, quota.QuotaExceeded):
+        raise failure
+    raise UpstreamUnavailable(f'{endpoint.name} is unavailable') from failure
+
+
+def backoff(attempt: int, failure: Union[Response, Exception, None]) -> float:
+    """Returns the pause before the next attempt: random value up to the exponentially
+    growing limit (full jitter) or the time asked by the server in the Retry-After header,
+    but not more than RETRY_MAX_DELAY
+
+    :param: attempt: number of the failed attempt
+    :type: attempt: integer
+    :param: failure: failed response or exception
+    :type: failure: Response object or Exception
+    :return: pause in seconds
+    :rtype: float"""
+
+    if isinstance(failure, Response):
+        retry_after: Optional[str] = failure.headers.get('Retry-After')
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), config.RETRY_MAX_DELAY)
+    return random.uniform(0, min(config.RETRY_BASE_DELAY * 2 ** (attempt - 1), config.RETRY_MAX_DELAY))
+
+
+def request_key(method: str, url: str, kwargs: Dict[str, Any]) -> str:
+    """Returns the key of the request in the saved responses (the headers are not included)"""
+
+    return json.dumps([method, url, kwargs.get('params'), kwargs.get('json')],
+                      sort_keys=True, default=str)
+
+
+def save_response(key: str, response: Response) -> None:
+    """Saves the successful response, which is returned if the same request fails later"""
+
+    with responses_lock:
+        responses[key] = response
+        responses.move_to_end(key)
+        if len(responses) > config.RESPONSE_CACHE_SIZE:
+            responses.popitem(last=False)
@@ -0,0 +1,35 @@
+from typing import Any, Dict, List, Tuple
+
+
+class ReorderBuffer:
+    """Buffer that receives results in any order and releases them strictly in the order
+    of their indexes: a result is held only until all the previous ones have been released
+
+    :param: next_index: index of the result which will be released next
+    :type: next_index: integer
+    :param: pending: results received ahead of their turn
+    :type: pending: dictionary with integers as keys"""
+
+    def __init__(self, start: int = 0):
+        self.next_index: int = start
+        self.pending: Dict[int, Any] = dict()
+
+    def push(self, index: int, item: Any) -> List[Tuple[int, Any]]:
+        """Accepts the result and returns all the results that can be released now
+
+        :param: index: index of the result
+        :type: index: integer
+        :param: item: the result
+        :type: item: Any
+        :return: indexes and results ready for releasing (in order)
+        :rtype: List[Tuple[int, Any]]"""
+
+        self.pending[index] = item
+        ready = list()
+        while self.next_index in self.pending:
+            ready.append((self.next_index, self.pending.pop(self.next_index)))
+            self.next_index += 1
+        return ready
+
+    def __len__(self) -> int:
+        return len(self.pending)
@@ -0,0 +1,118 @@
+"""Message templates of the bot.
+
+The emoji shortcodes of the templates are expanded once at import time,
+so rendering a message is a single str.format call"""
+
+import re
+from datetime import date
+from typing import List
+
+import emoji
+
+from models.database import Search
+from models.hotel import Hotel, hotel_url
+
+HOTEL_TEMPLATE: str = emoji.emojize(
+    ':hotel: Название отеля: {name}\n'
+    ':magnifying_glass_tilted_right: Адрес: {address}\n'
+    ':bar_chart: Общий рейтинг отеля: {rating}\n'
+    ':pinching_hand: Расстояние от центра города: {remoteness}\n'
+    ':coin: Цена за сутки: {price_per_night} USD\n'
+    ':money_bag: Цена за {nights} дней проживания: {price} USD\n'
+)
+# the characters of the (legacy) Markdown entities, which are escaped in the names from the API
+MARKDOWN_SPECIAL = re.compile(r'([_*`\[])')
+NO_ADDRESS: str = emoji.emojize(':house_with_garden:')
+NO_RATING: str = emoji.emojize(':smiling_face:')
+HISTORY_SEARCH_TEMPLATE: str = emoji.emojize(
+    '*Команда: {command}*\n'
+    '*Дата и время введения: {date_of_command:%d.%m.%Y %H:%M}*\n'
+    ':cityscape: {city}, {check_in:%d.%m.%Y} - {check_out:%d.%m.%Y}\n'
+)
+HISTORY_HOTEL_TEMPLATE: str = emoji.emojize(
+    '\n:hotel: {name}\n'
+    ':coin: {price} USD   :bar_chart: {rating}   :pinching_hand: {remoteness} км\n'
+    '{url}\n'
+)
+VISIT_WEBSITE: str = emoji.emojize('*Для просмотра дополнительных опций и фотографий *'
+                                   '* посетите  :backhand_index_pointing_down:*')
+
+
+def escape(text: str) -> str:
+    """Escapes the text inserted into the message with the Markdown parse mode
+    (telebot.formatting.escape_markdown is made for MarkdownV2, the legacy Markdown
+    allows to escape only _ * ` and [, the other backslashes are shown as is)
+
+    :param: text: the inserted text (e.g. the name of the hotel)
+    :type: text: string
+    :return: escaped text
+    :rtype: string"""
+
+    return MARKDOWN_SPECIAL.sub(r'\\\1', text)
+
+
+def nights(check_in: date, check_out: date) -> int:
+    """Returns the length of stay at the hotel (at least one night)
+
+    :param: check_in: check-in date
+    :type: check_in: date object
+    :param: check_out: check-out date
+    :type: check_out: date object
+    :return: number of nights
+    :rtype: integer"""
+
+    return max((check_out - check_in).days, 1)
+
+
+def render_hotel(hotel: Hotel, stay: int) -> str:
+    """Returns the description of the hotel
+
+    :param: hotel: record of the hotel
+    :type: hotel: Hotel
+    :param: stay: number of nights
+    :type: stay: integer
+    :return: description of the hotel
+    :rtype: string"""
+
+    return HOTEL_TEMPLATE.format(
+        name=escape(hotel.name),
+        address=escape(hotel.address) if hotel.address else NO_ADDRESS,
+        rating=hotel.rating or NO_RATING,
+        remoteness=hotel.remoteness,
+        price_per_night=round(hotel.price / stay, 2),
+        nights=stay,
+        price=hotel.price
+    )
+
+
+def render_search(search: Search, limit: int = 4096) -> List[str]:
+    """Returns the description of the search from the history with its displayed hotels
+    (split into several messages, if it is longer than the limit of the message)
+
+    :param: search: the search row with the prefetched results
+    :type: search: Search
+    :param: limit: maximum length of the message
+    :type: limit: integer
+    :return: texts of the messages
+    :rtype: list with strings"""
+
+    texts: List[str] = [HISTORY_SEARCH_TEMPLATE.format(
+        command=search.command,
+        date_of_command=search.date_of_command,
+        city=escape((search.city or '').title()),
+        check_in=search.check_in or search.date_of_command,
+        check_out=search.check_out or search.date_of_command
+    )]
+    for result in search.results:
+        text: str = HISTORY_HOTEL_TEMPLATE.format(
+            name=escape(result.name),
+            price=result.price,
+            rating=result.rating or NO_RATING,
+            remoteness=result.remoteness,
+            url=hotel_url(result.hotel_id)
+        )
+        if len(texts[-1]) + len(text) > limit:
+            texts.append(text)
+        else:
+            texts[-1] += text
+    return texts